@@ -1,12 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 from PIL import Image
 import os
 import datetime
 import time
-import base64
+import uuid
 from audio_recorder_streamlit import audio_recorder
-import tempfile
 
 from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
 from flask import Flask, Response
@@ -21,7 +21,14 @@ STATUS_STT_API_URL = "http://traefik/task_status_stt"
 STATUS_LLM_API_URL = "http://traefik/task_status_llm"
 STATUS_TTS_API_URL = "http://traefik/task_status_tts"
 
-GET_AUDIO_API_URL = "http://traefik/get_audio"
+# Address of traefik as seen from the browser (the audio is fetched by the browser, not by this server)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:443").rstrip("/")
+# URL the browser uses to stream the TTS audio
+AUDIO_PUBLIC_URL = os.getenv("AUDIO_PUBLIC_URL", f"{PUBLIC_BASE_URL}/get_audio")
+
+# TTS output format/bitrate requested from /tts (e.g. "opus" + "24k", or the "speech_low" preset)
+TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "mp3")
+TTS_AUDIO_BITRATE = os.getenv("TTS_AUDIO_BITRATE") or None
 
 # 🔹 Check if metric already exists before creating it
 if "frontend_request_count" not in REGISTRY._names_to_collectors:
@@ -35,32 +42,33 @@ def metrics():
     return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
 
-def save_audio_file(audio_bytes, file_extension):
+@st.cache_resource
+def get_http_session():
+    """One pooled HTTP session to traefik, shared by every rerun of the script."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+http = get_http_session()
+
+
+def audio_upload(audio_bytes, file_extension):
+    """Multipart file tuple built from memory, no temporary file needed."""
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     file_name = f"audio_{timestamp}.{file_extension}"
+    return (file_name, audio_bytes, f"audio/{file_extension}")
+
 
-    with open(file_name, "wb") as f:
-        f.write(audio_bytes)
-
-    return file_name
-
-
-def autoplay_audio(file_path: str):
-    with open(file_path, "rb") as f:
-        data = f.read()
-        b64 = base64.b64encode(data).decode()
-        # Without play box
-        md = f"""
-            <audio autoplay style="display:none;">
-                <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
-            </audio>
-            <script>
-                var audio = document.querySelector("audio");
-                audio.volume = 1.0;  // Set to max volume
-                audio.play();
-            </script>
-        """
-        st.markdown(md, unsafe_allow_html=True)
+def autoplay_audio(audio_url: str):
+    # The browser streams the file from /get_audio instead of a base64 data URI
+    md = f"""
+        <audio autoplay style="display:none;" src="{audio_url}">
+        </audio>
+    """
+    st.markdown(md, unsafe_allow_html=True)
 
 # def autoplay_audio(file_path: str):
 #     """Autoplay audio using base64 encoding in Streamlit."""
@@ -87,7 +95,7 @@ def poll_task_status(service_url, task_id):
 
     with st.spinner(f'{service_url[-3:].upper()} Task is still processing...'):
         while True:
-            response = requests.get(f"{service_url}/{task_id}")
+            response = http.get(f"{service_url}/{task_id}")
             if response.status_code == 200:
                 result = response.json()
                 if result['status'] == 'SUCCESS':
@@ -124,45 +132,51 @@ with col2:
                                     neutral_color="#0d3db9")
 
 
+# Conversation id, so the LLM remembers the previous questions of this browser session
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = str(uuid.uuid4())
+
 if audio_bytes:
     st.audio(audio_bytes, format="audio/wav")
-    audio_filename = save_audio_file(audio_bytes, "wav")
-    #st.write("Saved the audio")
-    #st.write(f"{audio_filename}")
+    # Correlation id linking the STT, LLM and TTS records of this interaction
+    interaction_id = str(uuid.uuid4())
+    stt_response = http.post(
+        STT_API_URL,
+        files={"audio": audio_upload(audio_bytes, "wav")},
+        data={"interaction_id": interaction_id},
+    )
 
-    with open(audio_filename, "rb") as audio_file:
-        stt_response = requests.post(STT_API_URL, files={"audio": audio_file})
-        
     if stt_response.status_code == 200:
         task_id = stt_response.json()['task_id']
         transcription = poll_task_status(STATUS_STT_API_URL, task_id)
         if transcription:
             st.write(f"**Text transcription:** {transcription}")
 
-            llm_response = requests.post(LLM_API_URL, json={"text": transcription})
+            llm_response = http.post(
+                LLM_API_URL,
+                json={"text": transcription, "interaction_id": interaction_id, "session_id": st.session_state["session_id"]},
+            )
             if llm_response.status_code == 200:
                 task_id = llm_response.json()['task_id']
                 llm_result = poll_task_status(STATUS_LLM_API_URL, task_id)
                 if llm_result:
                     st.write(f"**LLM response:** {llm_result}")
 
-                    tts_response = requests.post(TTS_API_URL, json={"text": llm_result})
+                    tts_response = http.post(
+                        TTS_API_URL,
+                        json={
+                            "text": llm_result,
+                            "format": TTS_AUDIO_FORMAT,
+                            "bitrate": TTS_AUDIO_BITRATE,
+                            "interaction_id": interaction_id,
+                        },
+                    )
                     if tts_response.status_code == 200:
                         task_id = tts_response.json()['task_id']
                         tts_result = poll_task_status(STATUS_TTS_API_URL, task_id)
                         if tts_result:
-                            audio_url = f"{GET_AUDIO_API_URL}/{tts_result}"
-                            tts_audio_response = requests.get(audio_url)
-                                    
-                            if tts_audio_response.status_code == 200:
-                                # # Step 4: Save the MP3 file locally
-                                local_audio_path = os.path.join("temp_audio", tts_result)
-                                os.makedirs("temp_audio", exist_ok=True)  # Create folder if not exists
-                                with open(local_audio_path, "wb") as f:
-                                    f.write(tts_audio_response.content)  # Save the audio file
-
-                                st.write("**Playing response in audio: :loud_sound:**")
-                                autoplay_audio(local_audio_path)  # Play the saved MP3 file
+                            st.write("**Playing response in audio: :loud_sound:**")
+                            autoplay_audio(f"{AUDIO_PUBLIC_URL}/{tts_result}")  # Browser streams it from the TTS service
 
 
 # Logo
@@ -1,6 +1,6 @@
-import os
 import time
 import logging
+import uuid
 from locust import HttpUser, task, between
 from requests.exceptions import RequestException
 
@@ -23,13 +23,14 @@ class MicroserviceUser(HttpUser):
         2. Send STT output to LLM
         3. Send LLM output to TTS
         """
-        stt_response = self.speech_to_text()
+        interaction_id = str(uuid.uuid4())
+        stt_response = self.speech_to_text(interaction_id)
         if stt_response:
-            llm_response = self.send_to_llm(stt_response)
+            llm_response = self.send_to_llm(stt_response, interaction_id)
             if llm_response:
-                self.text_to_speech(llm_response)
+                self.text_to_speech(llm_response, interaction_id)
 
-    def speech_to_text(self):
+    def speech_to_text(self, interaction_id=None):
         """ Sends an audio file to the STT service and retrieves the transcribed text. """
         logger.info("Starting STT request...")
         try:
@@ -37,6 +38,7 @@ class MicroserviceUser(HttpUser):
                 with self.client.post(
                     "/stt", 
                     files={"audio": audio_file}, 
+                    data={"interaction_id": interaction_id},
                     timeout=10, 
                     catch_response=True
                 ) as response:
@@ -83,11 +85,11 @@ class MicroserviceUser(HttpUser):
             wait_time = min(wait_time * 2, max_wait)
             retries += 1
 
-    def send_to_llm(self, text):
+    def send_to_llm(self, text, interaction_id=None):
         """ Sends transcribed text to the LLM service and returns the generated response. """
         logger.info("Sending text to LLM...")
         try:
-            with self.client.post("/llm", json={"text": text}, catch_response=True) as response:
+            with self.client.post("/llm", json={"text": text, "interaction_id": interaction_id}, catch_response=True) as response:
                 if response.status_code == 200:
                     task_id = response.json().get("task_id")
                     if not task_id:
@@ -103,11 +105,11 @@ class MicroserviceUser(HttpUser):
             logger.error(f"RequestException during LLM request: {e}")
             return None
 
-    def text_to_speech(self, text):
+    def text_to_speech(self, text, interaction_id=None):
         """ Sends generated text to the TTS service and receives an audio file. """
         logger.info("Sending text to TTS...")
         try:
-            with self.client.post("/tts", json={"text": text}, catch_response=True) as response:
+            with self.client.post("/tts", json={"text": text, "interaction_id": interaction_id}, catch_response=True) as response:
                 if response.status_code == 200:
                     task_id = response.json().get("task_id")
                     if not task_id:
@@ -0,0 +1,288 @@
+"""
+Replays a traffic capture (shared/traffic_capture.py) against a running stack.
+
+Requests are sent in their original order, keeping the original gaps between arrivals
+(divided by --speed) and the original mix of STT/LLM/TTS requests. Each replayed task
+is tracked through the bulk status endpoints until it finishes. The report shows the
+latency distribution per service (arrival to the worker's date_done) next to the one
+measured when the traffic was captured.
+
+    python traffic_replay.py --capture-dir ./traffic_capture --target http://localhost
+    python traffic_replay.py --capture-dir ./traffic_capture --speed 4 --json
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BULK_STATUS_PATH = "/task_status_{service}/bulk"
+BULK_STATUS_MAX_IDS = 1000
+
+DONE_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+# Request fields replaced by fresh ids in the replayed bodies
+REPLACED_ID_FIELDS = ("session_id", "interaction_id")
+
+MULTIPART_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+MULTIPART_FIELD_NAME = re.compile(rb'name="([^"]*)"')
+
+
+def load_capture(capture_dir):
+    """(requests sorted by arrival, {task_id: original latency}) from every <service>.jsonl."""
+    captured, latencies = [], {}
+    for path in sorted(glob.glob(os.path.join(capture_dir, "*.jsonl"))):
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["type"] == "request":
+                    captured.append(record)
+                elif record["type"] == "completion" and record.get("status") == "SUCCESS":
+                    latencies[record["task_id"]] = record["latency_seconds"]
+    captured.sort(key=lambda record: record["ts"])
+    return captured, latencies
+
+
+def to_timestamp(date_done):
+    if not date_done:
+        return None
+    date_done = datetime.datetime.fromisoformat(date_done)
+    if date_done.tzinfo is None:
+        date_done = date_done.replace(tzinfo=datetime.timezone.utc)
+    return date_done.timestamp()
+
+
+class Replay:
+    def __init__(self, target, capture_dir, speed, workers, poll_interval, timeout):
+        self.target = target.rstrip("/")
+        self.payload_dir = os.path.join(capture_dir, "payloads")
+        self.speed = speed
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.pending = {}  # task_id -> (service, sent_at, original task_id)
+        self.results = []  # {"service", "original_task_id", "latency", "status"}
+        self.errors = {}  # service -> count
+        self.skipped = 0
+        # Original session/interaction ids -> fresh ones, so the replay does not extend real conversations
+        self.id_map = {}
+
+    def _payload(self, record):
+        path = os.path.join(self.payload_dir, record["payload_sha256"])
+        if not record.get("payload_stored", True) or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            body = f.read()
+
+        content_type = record.get("content_type") or ""
+        if content_type.startswith("application/json"):
+            data = json.loads(body)
+            for field in REPLACED_ID_FIELDS:
+                if data.get(field):
+                    data[field] = self._fresh_id(data[field])
+            body = json.dumps(data).encode("utf-8")
+        elif content_type.startswith("multipart/form-data"):
+            body = self._replace_multipart_ids(body, content_type)
+        return body
+
+    def _fresh_id(self, original_id):
+        return self.id_map.setdefault(original_id, str(uuid.uuid4()))
+
+    def _replace_multipart_ids(self, body, content_type):
+        """Replaces the value of the id fields (not file parts) of a multipart/form-data body."""
+        match = MULTIPART_BOUNDARY.search(content_type)
+        if not match:
+            return body
+        delimiter = b"--" + match.group(1).encode("latin-1")
+
+        parts = body.split(delimiter)
+        for index, part in enumerate(parts):
+            headers, separator, value = part.partition(b"\r\n\r\n")
+            name = MULTIPART_FIELD_NAME.search(headers)
+            if not separator or not name or b"filename=" in headers:
+                continue
+            if name.group(1).decode("latin-1") not in REPLACED_ID_FIELDS or not value.endswith(b"\r\n"):
+                continue
+            original_id = value[:-2].decode("utf-8")
+            if original_id:
+                fresh_id = self._fresh_id(original_id).encode("utf-8")
+                parts[index] = headers + separator + fresh_id + b"\r\n"
+        return delimiter.join(parts)
+
+    def _send(self, record, body):
+        service = record["service"]
+        sent_at = time.time()
+        try:
+            response = self.http.request(
+                record.get("method", "POST"), self.target + record["endpoint"],
+                data=body, headers={"Content-Type": record["content_type"]}, timeout=30,
+            )
+            response.raise_for_status()
+            task_id = response.json()["task_id"]
+        except Exception as e:
+            print(f"❌ {service} request failed: {e}")
+            with self.lock:
+                self.errors[service] = self.errors.get(service, 0) + 1
+            return
+        with self.lock:
+            self.pending[task_id] = (service, sent_at, record["task_id"])
+
+    def _poll(self):
+        """Resolves finished tasks with one bulk status call per service."""
+        with self.lock:
+            by_service = {}
+            for task_id, (service, _, _) in self.pending.items():
+                by_service.setdefault(service, []).append(task_id)
+
+        for service, task_ids in by_service.items():
+            for start in range(0, len(task_ids), BULK_STATUS_MAX_IDS):
+                chunk = task_ids[start:start + BULK_STATUS_MAX_IDS]
+                try:
+                    response = self.http.post(
+                        self.target + BULK_STATUS_PATH.format(service=service), json={"task_ids": chunk}, timeout=30
+                    )
+                    response.raise_for_status()
+                    tasks = response.json()["tasks"]
+                except Exception as e:
+                    print(f"❌ {service} status poll failed: {e}")
+                    continue
+
+                now = time.time()
+                for task_id, task in tasks.items():
+                    if task["status"] not in DONE_STATES:
+                        continue
+                    with self.lock:
+                        service_name, sent_at, original_task_id = self.pending.pop(task_id)
+                        completed = to_timestamp(task.get("date_done")) or now
+                        self.results.append({
+                            "service": service_name,
+                            "original_task_id": original_task_id,
+                            "latency": completed - sent_at,
+                            "status": task["status"],
+                        })
+
+    def _poll_loop(self, sending_done):
+        while not sending_done.is_set() or self.pending:
+            if sending_done.is_set() and time.time() > self.deadline:
+                break
+            self._poll()
+            time.sleep(self.poll_interval)
+
+    def run(self, captured):
+        # Tasks are polled while the capture is still being sent
+        sending_done = threading.Event()
+        self.deadline = float("inf")
+        poller = threading.Thread(target=self._poll_loop, args=(sending_done,), daemon=True)
+        poller.start()
+
+        first_ts = captured[0]["ts"]
+        start = time.time()
+        for record in captured:
+            body = self._payload(record)
+            if body is None:
+                self.skipped += 1
+                continue
+            # Same gap to the first request as in the capture, scaled by --speed
+            delay = start + (record["ts"] - first_ts) / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.executor.submit(self._send, record, body)
+
+        self.executor.shutdown(wait=True)
+        print(f"✅ {len(captured) - self.skipped} requests sent in {time.time() - start:.1f}s, waiting for tasks...")
+
+        self.deadline = time.time() + self.timeout
+        sending_done.set()
+        poller.join()
+        return self.results
+
+
+def distribution(latencies):
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    else:
+        p50 = p90 = p99 = ordered[0]
+    return {"count": len(ordered), "mean": statistics.mean(ordered), "p50": p50, "p90": p90, "p99": p99,
+            "max": ordered[-1]}
+
+
+def build_report(captured, original_latencies, replay):
+    report = {}
+    for service in sorted({record["service"] for record in captured}):
+        original = [original_latencies[r["task_id"]] for r in captured
+                    if r["service"] == service and r["task_id"] in original_latencies]
+        replayed = [r["latency"] for r in replay.results if r["service"] == service and r["status"] == "SUCCESS"]
+        report[service] = {
+            "captured": sum(1 for r in captured if r["service"] == service),
+            "original": distribution(original),
+            "replay": distribution(replayed),
+            "failed": sum(1 for r in replay.results if r["service"] == service and r["status"] != "SUCCESS"),
+            "request_errors": replay.errors.get(service, 0),
+            "unfinished": sum(1 for service_name, _, _ in replay.pending.values() if service_name == service),
+        }
+    return report
+
+
+def print_report(report, skipped):
+    print(f"\n{'service':<8} {'run':<9} {'count':>6} {'mean_s':>8} {'p50_s':>8} {'p90_s':>8} {'p99_s':>8} {'max_s':>8}")
+    for service, result in report.items():
+        for run in ("original", "replay"):
+            stats = result[run]
+            if stats is None:
+                print(f"{service:<8} {run:<9} {'-':>6}")
+                continue
+            print(
+                f"{service:<8} {run:<9} {stats['count']:>6} {stats['mean']:>8.3f} {stats['p50']:>8.3f} "
+                f"{stats['p90']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f}"
+            )
+        if result["failed"] or result["request_errors"] or result["unfinished"]:
+            print(f"   ❌ {result['failed']} failed tasks, {result['request_errors']} request errors, "
+                  f"{result['unfinished']} unfinished")
+    if skipped:
+        print(f"\n{skipped} captured requests skipped (payload not in the side store)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured API traffic")
+    parser.add_argument("--capture-dir", required=True, help="TRAFFIC_CAPTURE_DIR of the captured stack")
+    parser.add_argument("--target", default="http://traefik", help="Base URL of the stack to replay against")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = original pace, 2 = twice as fast")
+    parser.add_argument("--workers", type=int, default=64, help="Concurrent requests in flight")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for tasks after the last request")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+    args = parser.parse_args()
+
+    captured, original_latencies = load_capture(args.capture_dir)
+    if not captured:
+        parser.error(f"No captured requests in {args.capture_dir}")
+
+    replay = Replay(args.target, args.capture_dir, args.speed, args.workers, args.poll_interval, args.timeout)
+    replay.run(captured)
+    report = build_report(captured, original_latencies, replay)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, replay.skipped)
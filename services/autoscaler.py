@@ -0,0 +1,184 @@
+"""
+Queue-depth-driven autoscaler for the Celery worker pools.
+
+The celery_worker container runs one dedicated worker per queue (stt@, llm@, tts@).
+Every tick this controller reads the Redis depth of each queue and the recent task
+durations recorded by services/celery_worker.py, estimates the backlog in seconds of
+work and grows or shrinks each pool (pool_grow / pool_shrink) between its min and max.
+When the desired pools don't fit in AUTOSCALE_TOTAL_MAX, the spare capacity goes to the
+queues with the largest backlog, so workers follow the current bottleneck stage.
+
+Run it next to the workers:  python -m services.autoscaler
+"""
+import math
+import os
+import socket
+import time
+
+from prometheus_client import Counter, Gauge, start_http_server
+
+from services.celery_worker import app, DURATION_KEY
+
+# Metrics definition
+QUEUE_DEPTH = Gauge("autoscaler_queue_depth", "Tarefas aguardando na fila", ["queue"])
+TASK_DURATION = Gauge("autoscaler_task_duration_seconds", "Duração média recente das tarefas", ["queue"])
+DESIRED_WORKERS = Gauge("autoscaler_desired_workers", "Processos desejados pelo autoscaler", ["queue"])
+CURRENT_WORKERS = Gauge("autoscaler_current_workers", "Processos ativos no pool", ["queue"])
+SCALE_EVENTS = Counter("autoscaler_scale_events_total", "Decisões de escala aplicadas", ["queue", "direction"])
+
+
+def _queue_config(queue, default_min, default_max, default_duration):
+    prefix = f"AUTOSCALE_{queue.upper()}"
+    return {
+        "min": int(os.getenv(f"{prefix}_MIN", default_min)),
+        "max": int(os.getenv(f"{prefix}_MAX", default_max)),
+        # Used until the worker has recorded real durations for this queue
+        "default_duration": float(os.getenv(f"{prefix}_DEFAULT_DURATION", default_duration)),
+    }
+
+
+# Autoscaler configuration
+autoscale_config = {
+    "queues": {
+        "stt": _queue_config("stt", 1, 8, 3.0),
+        "llm": _queue_config("llm", 1, 8, 2.0),
+        "tts": _queue_config("tts", 1, 8, 1.0),
+    },
+    "total_max": int(os.getenv("AUTOSCALE_TOTAL_MAX", 12)),
+    # Backlog (in seconds of work) each pool should be able to drain
+    "target_drain_seconds": float(os.getenv("AUTOSCALE_TARGET_DRAIN_SECONDS", 10)),
+    "interval": float(os.getenv("AUTOSCALE_INTERVAL", 5)),
+    "scale_up_cooldown": float(os.getenv("AUTOSCALE_SCALE_UP_COOLDOWN", 15)),
+    "scale_down_cooldown": float(os.getenv("AUTOSCALE_SCALE_DOWN_COOLDOWN", 60)),
+    "hostname": os.getenv("AUTOSCALE_HOSTNAME", socket.gethostname()),
+    "metrics_port": int(os.getenv("AUTOSCALE_METRICS_PORT", 5556)),
+}
+
+
+def read_queue_state(redis_client, queue, default_duration):
+    """Returns (depth, average recent duration) for a queue."""
+    pipe = redis_client.pipeline()
+    pipe.llen(queue)
+    pipe.lrange(DURATION_KEY.format(queue=queue), 0, -1)
+    depth, samples = pipe.execute()
+
+    durations = [float(s) for s in samples]
+    avg_duration = sum(durations) / len(durations) if durations else default_duration
+    return depth, avg_duration
+
+
+def desired_pool_sizes(states, queues, total_max, target_drain_seconds):
+    """
+    Computes the desired pool size per queue.
+
+    states: {queue: (depth, avg_duration)}
+    Each queue gets enough processes to drain its backlog within target_drain_seconds,
+    clamped to [min, max]. If the sum exceeds total_max, every queue keeps its min and
+    the remaining budget is split in proportion to the backlog (depth * duration).
+    """
+    backlog = {q: depth * duration for q, (depth, duration) in states.items()}
+    desired = {}
+    for queue, cfg in queues.items():
+        wanted = math.ceil(backlog[queue] / target_drain_seconds)
+        desired[queue] = max(cfg["min"], min(cfg["max"], wanted))
+
+    if sum(desired.values()) <= total_max:
+        return desired
+
+    budget = max(total_max - sum(cfg["min"] for cfg in queues.values()), 0)
+    extra_wanted = {q: desired[q] - queues[q]["min"] for q in queues}
+    total_backlog = sum(backlog[q] for q in queues if extra_wanted[q] > 0)
+
+    allocated = {}
+    for queue, cfg in queues.items():
+        share = budget * backlog[queue] / total_backlog if total_backlog and extra_wanted[queue] > 0 else 0
+        allocated[queue] = cfg["min"] + min(extra_wanted[queue], int(share))
+
+    # Hand out what integer rounding left over, biggest backlog first
+    leftover = total_max - sum(allocated.values())
+    for queue in sorted(queues, key=lambda q: backlog[q], reverse=True):
+        if leftover <= 0:
+            break
+        if allocated[queue] < desired[queue]:
+            allocated[queue] += 1
+            leftover -= 1
+
+    return allocated
+
+
+def current_pool_sizes(nodes):
+    """Asks the workers how many pool processes they are running."""
+    stats = app.control.inspect(destination=list(nodes.values()), timeout=2.0).stats() or {}
+    sizes = {}
+    for queue, node in nodes.items():
+        node_stats = stats.get(node)
+        if node_stats:
+            sizes[queue] = len(node_stats.get("pool", {}).get("processes", []))
+    return sizes
+
+
+def apply_scaling(queue, node, current, desired):
+    if desired > current:
+        app.control.pool_grow(desired - current, destination=[node])
+        SCALE_EVENTS.labels(queue=queue, direction="up").inc()
+        print(f"⬆️ {queue}: {current} -> {desired} processes")
+    elif desired < current:
+        app.control.pool_shrink(current - desired, destination=[node])
+        SCALE_EVENTS.labels(queue=queue, direction="down").inc()
+        print(f"⬇️ {queue}: {current} -> {desired} processes")
+
+
+def run():
+    queues = autoscale_config["queues"]
+    nodes = {queue: f"{queue}@{autoscale_config['hostname']}" for queue in queues}
+    redis_client = app.backend.client
+    last_scaled = {queue: 0.0 for queue in queues}
+    last_direction = {queue: None for queue in queues}
+
+    start_http_server(autoscale_config["metrics_port"])
+    print(f"🔍 Autoscaler watching {', '.join(nodes.values())}")
+
+    while True:
+        try:
+            states = {}
+            for queue, cfg in queues.items():
+                depth, avg_duration = read_queue_state(redis_client, queue, cfg["default_duration"])
+                states[queue] = (depth, avg_duration)
+                QUEUE_DEPTH.labels(queue=queue).set(depth)
+                TASK_DURATION.labels(queue=queue).set(avg_duration)
+
+            desired = desired_pool_sizes(
+                states, queues, autoscale_config["total_max"], autoscale_config["target_drain_seconds"]
+            )
+            current = current_pool_sizes(nodes)
+
+            now = time.time()
+            for queue in queues:
+                DESIRED_WORKERS.labels(queue=queue).set(desired[queue])
+                if queue not in current:
+                    print(f"❌ Worker {nodes[queue]} did not answer, skipping")
+                    continue
+                CURRENT_WORKERS.labels(queue=queue).set(current[queue])
+
+                if desired[queue] == current[queue]:
+                    continue
+                direction = "up" if desired[queue] > current[queue] else "down"
+                cooldown = autoscale_config[f"scale_{direction}_cooldown"]
+                # A reversal always waits for the scale-down cooldown to avoid flapping
+                if last_direction[queue] not in (None, direction):
+                    cooldown = max(cooldown, autoscale_config["scale_down_cooldown"])
+                if now - last_scaled[queue] < cooldown:
+                    continue
+
+                apply_scaling(queue, nodes[queue], current[queue], desired[queue])
+                last_scaled[queue] = now
+                last_direction[queue] = direction
+
+        except Exception as e:
+            print(f"❌ Autoscaler tick failed: {e}")
+
+        time.sleep(autoscale_config["interval"])
+
+
+if __name__ == "__main__":
+    run()
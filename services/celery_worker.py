@@ -1,18 +1,48 @@
-from celery import Celery
-
-# Define Celery instance
-app = Celery(
-    "celery_worker",
-    broker="redis://redis:6379/0",
-    backend="redis://redis:6379/0"
-)
-
-# Autodiscover tasks from STT, LLM, and TTS
-app.autodiscover_tasks([
-    "services.stt_api",
-    "services.llm_api",
-    "services.tts_api"
+from celery.signals import task_prerun, task_postrun
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.celery_config import make_celery
+
+# Define Celery instance with the STT, LLM, and TTS task modules
+app = make_celery("celery_worker", include=[
+    "services.stt_tasks",
+    "services.llm_tasks",
+    "services.tts_tasks"
 ])
 
+# Recent task durations per queue, read by services/autoscaler.py
+DURATION_KEY = "autoscaler:durations:{queue}"
+DURATION_SAMPLES = 50
+
+_task_start = {}
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _task_start[task_id] = time.time()
+
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, **kwargs):
+    start_time = _task_start.pop(task_id, None)
+    if start_time is None or task is None:
+        return
+
+    queue = (task.request.delivery_info or {}).get("routing_key")
+    if not queue:
+        return
+
+    try:
+        key = DURATION_KEY.format(queue=queue)
+        pipe = app.backend.client.pipeline()
+        pipe.lpush(key, time.time() - start_time)
+        pipe.ltrim(key, 0, DURATION_SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        print(f"❌ Could not record task duration: {e}")
+
+
 if __name__ == "__main__":
     app.start()
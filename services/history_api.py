@@ -0,0 +1,260 @@
+from flask import Flask, request, jsonify
+import base64
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from pymongo import MongoClient
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Flask app initialization
+app = Flask(__name__)
+
+# Metrics definition
+HISTORY_REQUEST_COUNT = Counter("history_request_count", "Total de consultas ao histórico")
+HISTORY_LATENCY = Histogram("history_latency_seconds", "Tempo de consulta ao histórico")
+
+# Database configuration (the three stores of the pipeline)
+stt_db_config = {
+    "dbname": os.getenv("STT_POSTGRES_DB", "stt_service"),
+    "user": os.getenv("STT_POSTGRES_USER", "postgres"),
+    "password": os.getenv("STT_POSTGRES_PASSWORD", "mypassword"),
+    "host": os.getenv("STT_POSTGRES_HOST", "postgres_stt"),
+    "port": int(os.getenv("STT_POSTGRES_PORT", 5432))
+}
+
+tts_db_config = {
+    "dbname": os.getenv("TTS_POSTGRES_DB", "tts_service"),
+    "user": os.getenv("TTS_POSTGRES_USER", "postgres"),
+    "password": os.getenv("TTS_POSTGRES_PASSWORD", "mypassword"),
+    "host": os.getenv("TTS_POSTGRES_HOST", "postgres_tts"),
+    "port": int(os.getenv("TTS_POSTGRES_PORT", 5432))
+}
+
+mongo_config = {
+    "host": os.getenv("MONGO_HOST", "mongo"),
+    "port": int(os.getenv("MONGO_PORT", 27017)),
+    "db_name": os.getenv("MONGO_DB", "llm_service")
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+# Pools are created lazily so the app starts even if a database is still booting
+_pools = {}
+_pools_lock = threading.Lock()  # The threaded server could otherwise build a pool twice
+_mongo_client = None
+
+
+def get_pool(name):
+    if name not in _pools:
+        with _pools_lock:
+            if name not in _pools:
+                config = stt_db_config if name == "stt" else tts_db_config
+                _pools[name] = ThreadedConnectionPool(1, 10, **config)
+    return _pools[name]
+
+
+def get_llm_collection():
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = MongoClient(mongo_config["host"], mongo_config["port"])
+    return _mongo_client[mongo_config["db_name"]].llm_queries
+
+
+def fetch_all(pool_name, query, params):
+    pool = get_pool(pool_name)
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            columns = [column.name for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.rollback()  # Read-only, just end the transaction
+        return rows
+    finally:
+        pool.putconn(conn)
+
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of a next_cursor. Raises ValueError if it is malformed."""
+    value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(value, list) and len(value) == 2 and isinstance(value[0], str)
+            and isinstance(value[1], int) and not isinstance(value[1], bool)):
+        raise ValueError("Invalid cursor")
+    return datetime.datetime.fromisoformat(value[0]), value[1]
+
+
+def limit_param():
+    """Page size from the limit query param, clamped to [1, MAX_PAGE_SIZE]. Raises ValueError."""
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("'limit' must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def serialize(record):
+    """JSON-friendly copy of a record (timestamps as ISO strings, audio as base64)."""
+    result = {}
+    for key, value in record.items():
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        elif isinstance(value, (bytes, memoryview)):
+            value = base64.b64encode(bytes(value)).decode()
+        result[key] = value
+    return result
+
+
+def stt_columns(include_audio):
+    # audio_data is TOASTed out of line, leaving it out keeps the scan on small tuples
+    columns = "id, interaction_id, audio_filename, transcription, created_at"
+    return columns + (", audio_data" if include_audio else "")
+
+
+def tts_columns(include_audio):
+    columns = "id, interaction_id, text, audio_filename, created_at"
+    return columns + (", audio_data" if include_audio else "")
+
+
+def load_related(interaction_ids, include_audio):
+    """LLM and TTS records of the given interactions, keyed by interaction_id."""
+    ids = [i for i in interaction_ids if i]
+    if not ids:
+        return {}, {}
+
+    tts_rows = fetch_all(
+        "tts",
+        f"SELECT {tts_columns(include_audio)} FROM tts_results WHERE interaction_id = ANY(%s) ORDER BY created_at;",
+        (ids,),
+    )
+    llm_docs = get_llm_collection().find(
+        {"interaction_id": {"$in": ids}},
+        projection={"_id": 0, "interaction_id": 1, "question": 1, "answer": 1, "timestamp": 1},
+    )
+
+    tts_by_id, llm_by_id = {}, {}
+    for row in tts_rows:
+        tts_by_id.setdefault(row["interaction_id"], []).append(serialize(row))
+    for doc in llm_docs:
+        llm_by_id.setdefault(doc["interaction_id"], []).append(serialize(doc))
+    return llm_by_id, tts_by_id
+
+
+def build_interactions(stt_rows, include_audio):
+    llm_by_id, tts_by_id = load_related([row["interaction_id"] for row in stt_rows], include_audio)
+    interactions = []
+    for row in stt_rows:
+        interaction_id = row["interaction_id"]
+        interactions.append({
+            "interaction_id": interaction_id,
+            "created_at": row["created_at"].isoformat(),
+            "stt": serialize(row),
+            "llm": llm_by_id.get(interaction_id, []),
+            "tts": tts_by_id.get(interaction_id, []),
+        })
+    return interactions
+
+
+def include_audio_param():
+    return request.args.get("include_audio", "false").lower() in ("1", "true", "yes")
+
+
+@app.route("/metrics")
+def metrics():
+    return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+
+@app.route('/history', methods=['GET'])
+def list_history():
+    """
+    Latest interactions, newest first, with keyset pagination.
+
+    Query params: limit, cursor (next_cursor of the previous page), include_audio.
+    """
+    HISTORY_REQUEST_COUNT.inc()
+    start_time = time.time()
+    try:
+        # Validate the query params up front: bad input is a 400, not a 500
+        try:
+            limit = limit_param()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                created_at, row_id = decode_cursor(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+        include_audio = include_audio_param()
+        if cursor:
+            # Row comparison walks the (created_at DESC, id DESC) index from the cursor on
+            stt_rows = fetch_all(
+                "stt",
+                f"""
+                SELECT {stt_columns(include_audio)} FROM stt_transcriptions
+                WHERE (created_at, id) < (%s, %s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s;
+                """,
+                (created_at, row_id, limit),
+            )
+        else:
+            stt_rows = fetch_all(
+                "stt",
+                f"""
+                SELECT {stt_columns(include_audio)} FROM stt_transcriptions
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s;
+                """,
+                (limit,),
+            )
+
+        next_cursor = None
+        if len(stt_rows) == limit:
+            last = stt_rows[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+
+        return jsonify({"items": build_interactions(stt_rows, include_audio), "next_cursor": next_cursor})
+
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        HISTORY_LATENCY.observe(time.time() - start_time)
+
+
+@app.route('/history/<interaction_id>', methods=['GET'])
+def get_interaction(interaction_id):
+    HISTORY_REQUEST_COUNT.inc()
+    start_time = time.time()
+    try:
+        include_audio = include_audio_param()
+        stt_rows = fetch_all(
+            "stt",
+            f"SELECT {stt_columns(include_audio)} FROM stt_transcriptions WHERE interaction_id = %s;",
+            (interaction_id,),
+        )
+        if not stt_rows:
+            return jsonify({"error": "Interaction not found"}), 404
+        return jsonify(build_interactions(stt_rows, include_audio)[0])
+
+    except psycopg2.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        HISTORY_LATENCY.observe(time.time() - start_time)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8507, debug=True)
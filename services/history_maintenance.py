@@ -0,0 +1,56 @@
+"""
+Retention job for the interaction history.
+
+Every HISTORY_MAINTENANCE_INTERVAL seconds it creates the upcoming monthly partitions,
+drops the ones older than HISTORY_RETENTION_DAYS and keeps the Mongo TTL index in sync.
+
+    python -m services.history_maintenance          # loop
+    python -m services.history_maintenance --once
+"""
+import argparse
+import os
+import time
+
+import psycopg2
+from pymongo import MongoClient
+
+from services.history_schema import (
+    history_config, ensure_postgres_schema, drop_expired_partitions, ensure_mongo_indexes
+)
+from services.history_api import stt_db_config, tts_db_config, mongo_config
+
+MAINTENANCE_INTERVAL = int(os.getenv("HISTORY_MAINTENANCE_INTERVAL", 3600))
+
+
+def run_once():
+    for table, db_config in (("stt_transcriptions", stt_db_config), ("tts_results", tts_db_config)):
+        try:
+            conn = psycopg2.connect(**db_config)
+            try:
+                ensure_postgres_schema(conn, table, force=True)
+                drop_expired_partitions(conn, table)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"❌ ERROR maintaining '{table}': {e}")
+
+    try:
+        mongo_client = MongoClient(mongo_config["host"], mongo_config["port"])
+        ensure_mongo_indexes(mongo_client[mongo_config["db_name"]].llm_queries)
+        mongo_client.close()
+    except Exception as e:
+        print(f"❌ ERROR maintaining 'llm_queries': {e}")
+
+    print(f"✅ History maintenance done (retention: {history_config['retention_days']} days)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interaction history retention job")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    args = parser.parse_args()
+
+    while True:
+        run_once()
+        if args.once:
+            break
+        time.sleep(MAINTENANCE_INTERVAL)
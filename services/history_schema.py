@@ -0,0 +1,316 @@
+"""
+Schema of the interaction history stores.
+
+- stt_transcriptions / tts_results (Postgres) are range-partitioned by month on created_at,
+  indexed on (created_at DESC, id DESC) for keyset pagination and on interaction_id.
+  Tables created before partitioning are attached as a "<table>_legacy" partition.
+- llm_queries (Mongo) is indexed on interaction_id, with a TTL index on timestamp.
+
+interaction_id is the correlation id shared by the three records of one interaction.
+Check the legacy migration against a live Postgres (in a scratch schema, dropped afterwards) with:
+
+    python -m services.history_schema check-migration --host postgres_stt
+"""
+import argparse
+import datetime
+import os
+import re
+
+# History configuration
+history_config = {
+    "retention_days": int(os.getenv("HISTORY_RETENTION_DAYS", 180)),
+    # Monthly partitions created ahead of time
+    "partitions_ahead": int(os.getenv("HISTORY_PARTITIONS_AHEAD", 2)),
+}
+
+# Columns of each partitioned table besides id, interaction_id and created_at
+POSTGRES_TABLES = {
+    "stt_transcriptions": """
+        audio_filename TEXT NOT NULL,
+        transcription TEXT NOT NULL,
+        audio_data BYTEA NOT NULL,
+    """,
+    "tts_results": """
+        text TEXT NOT NULL,
+        audio_filename TEXT NOT NULL,
+        audio_data BYTEA NOT NULL,
+    """,
+}
+
+PARTITION_BOUND_UPPER = re.compile(r"TO \('([^']+)'\)")
+
+_ready = set()
+
+
+def _month_start(day):
+    return datetime.datetime(day.year, day.month, 1)
+
+
+def _add_months(month, n):
+    year, month_index = divmod(month.month - 1 + n, 12)
+    return datetime.datetime(month.year + year, month_index + 1, 1)
+
+
+def _relkind(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _upper_bound(cursor, partition):
+    """Upper bound of a partition's range, or None if it does not exist (or is the DEFAULT one)."""
+    cursor.execute("SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE oid = to_regclass(%s);", (partition,))
+    row = cursor.fetchone()
+    match = PARTITION_BOUND_UPPER.search(row[0] or "") if row else None
+    return datetime.datetime.fromisoformat(match.group(1)) if match else None
+
+
+def _legacy_upper_bound(cursor, legacy, now):
+    """First month start after the newest legacy row, never before the current month."""
+    cursor.execute(f"SELECT max(created_at) FROM {legacy};")
+    newest = cursor.fetchone()[0]
+    bound = _month_start(now)
+    if newest is not None:
+        bound = max(bound, _add_months(_month_start(newest), 1))
+    return bound
+
+
+def _migrate_legacy_table(cursor, table):
+    """Turns an unpartitioned table into the first partition of the new partitioned table."""
+    legacy = f"{table}_legacy"
+    print(f"🔍 Migrating '{table}' to a partitioned table, old rows go to '{legacy}'")
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    cursor.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey;")
+    cursor.execute(f"ALTER TABLE {legacy} ADD COLUMN IF NOT EXISTS interaction_id TEXT;")
+    cursor.execute(f"UPDATE {legacy} SET created_at = '1970-01-01' WHERE created_at IS NULL;")
+    cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN created_at SET NOT NULL;")
+    # A partition cannot keep its own (id) primary key next to the parent's (id, created_at)
+    cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_pkey, ADD PRIMARY KEY (id, created_at);")
+    return legacy
+
+
+def create_partition(cursor, table, month):
+    name = f"{table}_p{month:%Y_%m}"
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table}
+        FOR VALUES FROM (%s) TO (%s);
+        """,
+        (month, _add_months(month, 1)),
+    )
+    return name
+
+
+def ensure_postgres_schema(conn, table, now=None, force=False):
+    """
+    Creates (or migrates) the partitioned table, its indexes and the upcoming partitions.
+
+    Runs the DDL once per process unless force=True; an advisory lock serializes concurrent workers.
+    """
+    if table in _ready and not force:
+        return
+
+    now = now or datetime.datetime.now()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (table,))
+
+        legacy = None
+        relkind = _relkind(cursor, table)
+        if relkind == "r":
+            legacy = _migrate_legacy_table(cursor, table)
+
+        if relkind != "p":
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq AS INTEGER;")
+            cursor.execute(
+                f"""
+                CREATE TABLE {table} (
+                    id INTEGER NOT NULL DEFAULT nextval('{table}_id_seq'),
+                    interaction_id TEXT,
+                    {POSTGRES_TABLES[table]}
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, created_at)
+                ) PARTITION BY RANGE (created_at);
+                """
+            )
+            # The sequence must survive dropping the legacy partition
+            cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;")
+            if legacy:
+                # New ids continue after the legacy ones
+                cursor.execute(
+                    f"SELECT setval('{table}_id_seq', (SELECT COALESCE(max(id), 0) + 1 FROM {legacy}), false);"
+                )
+            print(f"✅ Table '{table}' created (partitioned by month)!")
+
+        if legacy:
+            # Old rows may include the current month: the legacy range ends after the newest one
+            cursor.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO (%s);",
+                (_legacy_upper_bound(cursor, legacy, now),),
+            )
+
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at_idx ON {table} (created_at DESC, id DESC);")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_interaction_id_idx ON {table} (interaction_id);")
+
+        # Monthly partitions start where the legacy partition (if any) ends
+        month = _month_start(now)
+        legacy_bound = _upper_bound(cursor, f"{table}_legacy")
+        if legacy_bound is not None and legacy_bound > month:
+            month = legacy_bound
+        last_month = _add_months(_month_start(now), history_config["partitions_ahead"])
+        while month <= last_month:
+            create_partition(cursor, table, month)
+            month = _add_months(month, 1)
+        # Catches rows whose month partition is missing, so inserts never fail
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+
+        conn.commit()
+        _ready.add(table)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def drop_expired_partitions(conn, table, retention_days=None, now=None):
+    """Drops the partitions whose whole range is older than the retention window."""
+    retention_days = retention_days or history_config["retention_days"]
+    cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=retention_days)
+
+    cursor = conn.cursor()
+    dropped = []
+    try:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s);
+            """,
+            (table,),
+        )
+        for name, bound in cursor.fetchall():
+            match = PARTITION_BOUND_UPPER.search(bound or "")
+            if not match:
+                continue  # DEFAULT partition
+            if datetime.datetime.fromisoformat(match.group(1)) <= cutoff:
+                cursor.execute(f"DROP TABLE {name};")
+                dropped.append(name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    for name in dropped:
+        print(f"🗑️ Dropped expired partition '{name}'")
+    return dropped
+
+
+def ensure_mongo_indexes(collection, retention_days=None):
+    """interaction_id lookup index and a TTL index on timestamp (Mongo's retention)."""
+    from pymongo import ASCENDING
+    from pymongo.errors import OperationFailure
+
+    if collection.full_name in _ready:
+        return
+
+    ttl = (retention_days or history_config["retention_days"]) * 86400
+    collection.create_index([("interaction_id", ASCENDING)], name="interaction_id_idx")
+    try:
+        collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl_idx", expireAfterSeconds=ttl)
+    except OperationFailure:
+        # The index exists with another retention, update it in place
+        collection.database.command(
+            "collMod", collection.name, index={"name": "timestamp_ttl_idx", "expireAfterSeconds": ttl}
+        )
+    _ready.add(collection.full_name)
+
+
+def check_migration(db_config):
+    """
+    Migrates an old-style stt_transcriptions table holding a row of the current month
+    (and one of the previous month) in a scratch schema, then checks that both rows are
+    kept and that new rows can be inserted.
+    """
+    import psycopg2
+
+    schema = "history_migration_check"
+    now = datetime.datetime.now()
+    conn = psycopg2.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {schema};")
+        cursor.execute(f"SET search_path TO {schema};")
+        # Table as created before partitioning
+        cursor.execute(
+            """
+            CREATE TABLE stt_transcriptions (
+                id SERIAL PRIMARY KEY,
+                audio_filename TEXT NOT NULL,
+                transcription TEXT NOT NULL,
+                audio_data BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO stt_transcriptions (audio_filename, transcription, audio_data, created_at)
+            VALUES ('same_month.wav', 'same month', '', %s), ('last_month.wav', 'last month', '', %s);
+            """,
+            (now, _add_months(_month_start(now), -1)),
+        )
+        conn.commit()
+
+        ensure_postgres_schema(conn, "stt_transcriptions", now=now, force=True)
+
+        cursor.execute("SELECT count(*), max(id) FROM stt_transcriptions_legacy;")
+        legacy_rows, legacy_max_id = cursor.fetchone()
+        legacy_bound = _upper_bound(cursor, "stt_transcriptions_legacy")
+
+        # A row of the current month (still in the legacy range) and one of the next monthly partition
+        cursor.execute(
+            """
+            INSERT INTO stt_transcriptions (audio_filename, transcription, audio_data, created_at)
+            VALUES ('now.wav', 'new row', '', %s), ('next.wav', 'new row', '', %s)
+            RETURNING id, tableoid::regclass::text;
+            """,
+            (now, legacy_bound),
+        )
+        inserted = cursor.fetchall()
+        conn.rollback()
+
+        assert legacy_rows == 2, f"expected 2 legacy rows, found {legacy_rows}"
+        assert legacy_bound == _add_months(_month_start(now), 1), f"unexpected legacy bound {legacy_bound}"
+        assert all(row_id > legacy_max_id for row_id, _ in inserted), f"new ids {inserted} reuse legacy ids"
+        assert inserted[1][1] == f"stt_transcriptions_p{legacy_bound:%Y_%m}", f"unexpected partition {inserted[1][1]}"
+        print(
+            f"✅ Migration check passed: legacy partition up to {legacy_bound}, "
+            f"new rows {inserted} (legacy max id {legacy_max_id})"
+        )
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interaction history schema")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check_parser = subparsers.add_parser("check-migration", help="Check the legacy table migration")
+    check_parser.add_argument("--host", default=os.getenv("POSTGRES_HOST", "postgres_stt"))
+    check_parser.add_argument("--port", type=int, default=int(os.getenv("POSTGRES_PORT", 5432)))
+    check_parser.add_argument("--dbname", default=os.getenv("POSTGRES_DB", "stt_service"))
+    check_parser.add_argument("--user", default=os.getenv("POSTGRES_USER", "postgres"))
+    check_parser.add_argument("--password", default=os.getenv("POSTGRES_PASSWORD", "mypassword"))
+
+    args = parser.parse_args()
+    check_migration({
+        "host": args.host, "port": args.port, "dbname": args.dbname, "user": args.user, "password": args.password,
+    })
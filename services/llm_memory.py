@@ -0,0 +1,110 @@
+"""
+Session-scoped conversation memory for the LLM stage.
+
+Turns are kept in Redis (one list per session, expiring after LLM_SESSION_TTL seconds).
+Prompts always start with the same system prompt, so the backend can reuse its prompt
+cache; recent turns are added newest first until LLM_CONTEXT_TOKEN_BUDGET is reached and
+older turns are folded into a one-line summary of what the user asked.
+"""
+import json
+import math
+import os
+
+import redis
+
+from shared.celery_config import CELERY_RESULT_BACKEND
+
+SYSTEM_PROMPT = """You are a helpful and knowledgeable assistant.
+                Give clear, accurate, and concise answers.
+                When explaining something, keep it short and easy to understand.
+                Use examples only when they make the answer clearer.
+                Avoid unnecessary details or repetition."""
+
+# Conversation memory configuration
+memory_config = {
+    "redis_url": os.getenv("LLM_MEMORY_REDIS_URL", CELERY_RESULT_BACKEND),
+    # Tokens for system prompt + history + question (the answer's max_tokens is separate)
+    "token_budget": int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", 1500)),
+    "max_turns": int(os.getenv("LLM_MEMORY_MAX_TURNS", 20)),
+    "ttl": int(os.getenv("LLM_SESSION_TTL", 3600)),
+    "summary_chars": int(os.getenv("LLM_SUMMARY_CHARS", 300)),
+}
+
+SESSION_KEY = "llm:session:{session_id}"
+
+# Rough cost of the chat template around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_redis_client = None
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(memory_config["redis_url"])
+    return _redis_client
+
+
+def estimate_tokens(text):
+    """~4 characters per token, close enough for budgeting without a tokenizer."""
+    return math.ceil(len(text or "") / 4) + MESSAGE_OVERHEAD_TOKENS
+
+
+def load_turns(session_id):
+    """Previous turns of the session, oldest first: [{"question", "answer"}]."""
+    raw_turns = get_redis().lrange(SESSION_KEY.format(session_id=session_id), 0, -1)
+    return [json.loads(raw) for raw in raw_turns]
+
+
+def save_turn(session_id, question, answer):
+    key = SESSION_KEY.format(session_id=session_id)
+    pipe = get_redis().pipeline()
+    pipe.rpush(key, json.dumps({"question": question, "answer": answer}))
+    pipe.ltrim(key, -memory_config["max_turns"], -1)
+    pipe.expire(key, memory_config["ttl"])
+    pipe.execute()
+
+
+def summarize_turns(turns, max_chars):
+    """One-line extractive summary of dropped turns (no extra LLM call)."""
+    questions = "; ".join(turn["question"].strip() for turn in turns)
+    summary = f"Earlier in this conversation the user asked about: {questions}"
+    if len(summary) > max_chars:
+        summary = summary[:max_chars - 3].rstrip() + "..."
+    return summary
+
+
+def build_messages(question, turns, token_budget=None):
+    """
+    Chat messages for the question within the token budget.
+
+    Returns (messages, estimated_input_tokens, turns_included).
+    """
+    token_budget = token_budget or memory_config["token_budget"]
+    system_message = {"role": "system", "content": SYSTEM_PROMPT}
+    question_message = {"role": "user", "content": question}
+    used = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(question)
+
+    # Newest turns first, as long as they fit
+    included = []
+    for turn in reversed(turns):
+        cost = estimate_tokens(turn["question"]) + estimate_tokens(turn["answer"])
+        if used + cost > token_budget:
+            break
+        included.insert(0, turn)
+        used += cost
+
+    messages = [system_message]
+    dropped = turns[:len(turns) - len(included)]
+    if dropped:
+        summary = summarize_turns(dropped, memory_config["summary_chars"])
+        if used + estimate_tokens(summary) <= token_budget:
+            # After the system prompt, so the stable prefix stays byte-identical
+            messages.append({"role": "system", "content": summary})
+            used += estimate_tokens(summary)
+
+    for turn in included:
+        messages.append({"role": "user", "content": turn["question"]})
+        messages.append({"role": "assistant", "content": turn["answer"]})
+    messages.append(question_message)
+    return messages, used, len(included)
@@ -0,0 +1,112 @@
+"""
+LLM worker: Celery task that queries the Hugging Face Inference API. Only the worker
+imports this module, the HTTP API (services/llm_api.py) sends tasks by name.
+"""
+import datetime
+import os
+import sys
+import time
+from pymongo import MongoClient
+from dotenv import load_dotenv
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.celery_config import make_celery
+from services.history_schema import ensure_mongo_indexes
+from services.llm_memory import build_messages, load_turns, save_turn
+from services.task_resilience import breaker, run_step, clear_checkpoints, retry_task
+from prometheus_client import Counter, Histogram
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env")))
+
+# Metrics definition
+LLM_REQUEST_COUNT = Counter("llm_request_count", "Total de requisições ao LLM")
+LLM_LATENCY = Histogram("llm_latency_seconds", "Tempo de inferência do LLM")
+LLM_TEXT_SIZE = Histogram("llm_text_size_bytes", "Tamanho do texto recebido")
+LLM_INPUT_TOKENS = Histogram(
+    "llm_input_tokens", "Tokens de entrada por requisição (prompt + histórico)",
+    buckets=(64, 128, 256, 512, 1024, 1536, 2048, 4096, 8192),
+)
+LLM_PROMPT_BUILD_SECONDS = Histogram(
+    "llm_prompt_build_seconds", "Tempo de montagem do prompt com o histórico",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+# MongoDB Configuration
+mongo_config = {
+    "host": os.getenv("MONGO_HOST", "mongo"),  # MongoDB host
+    "port": int(os.getenv("MONGO_PORT", 27017)),
+    "db_name": os.getenv("MONGO_DB", "llm_service")
+}
+
+celery = make_celery("services.llm_tasks")
+
+
+# Celery Task to process the LLM query
+@celery.task(bind=True, name="process_llm_query")
+def process_llm_query(self, question, interaction_id=None, session_id=None):
+    try:
+        # Request metrics (first attempt only)
+        if not self.request.retries:
+            LLM_REQUEST_COUNT.inc()
+            LLM_TEXT_SIZE.observe(len(question))
+
+        # Each step is checkpointed: a retry only re-runs the steps that did not complete
+        answer = run_step(self, "answer", answer_question, question, session_id)
+        if session_id:
+            run_step(self, "memory", save_turn, session_id, question, answer)
+        run_step(self, "persist", breaker("mongo").call, save_answer, question, answer, interaction_id)
+
+        clear_checkpoints(self)
+        return answer
+
+    except Exception as e:
+        raise retry_task(self, e)
+
+
+def answer_question(question, session_id):
+    start_time = time.time()
+
+    # Prompt: stable system prompt + recent turns of the session (within the token budget) + question
+    turns = load_turns(session_id) if session_id else []
+    messages, estimated_tokens, turns_included = build_messages(question, turns)
+    LLM_PROMPT_BUILD_SECONDS.observe(time.time() - start_time)
+
+    from huggingface_hub import InferenceClient
+
+    client = InferenceClient("Qwen/Qwen2.5-72B-Instruct", token=os.getenv("HF_TOKEN"))
+    resp = breaker("huggingface").call(
+        client.chat_completion,
+        messages=messages,
+        max_tokens=256,
+        temperature=0,
+    )
+    answer = resp.choices[0].message.content
+
+    # Real prompt size when the backend reports it
+    usage = getattr(resp, "usage", None)
+    LLM_INPUT_TOKENS.observe(getattr(usage, "prompt_tokens", None) or estimated_tokens)
+    print(f"LLM prompt: {turns_included}/{len(turns)} previous turns, ~{estimated_tokens} tokens")
+
+    # Latency metrics
+    duration = time.time() - start_time
+    LLM_LATENCY.observe(duration)
+    return answer
+
+
+def save_answer(question, answer, interaction_id):
+    """Saves the question and answer to MongoDB."""
+    mongo_client = MongoClient(mongo_config["host"], mongo_config["port"])
+    try:
+        collection = mongo_client[mongo_config["db_name"]].llm_queries
+        ensure_mongo_indexes(collection)
+        collection.insert_one({
+            "interaction_id": interaction_id,
+            "question": question,
+            "answer": answer,
+            "timestamp": datetime.datetime.now()
+        })
+    finally:
+        mongo_client.close()
+
+    print(f"LLM query saved to MongoDB: {answer}")
+    return True
@@ -0,0 +1,137 @@
+"""
+Cold-start and import-profile benchmark for the API processes.
+
+For each service it imports, in a fresh interpreter:
+
+- api: the HTTP app alone (what the API process loads now)
+- worker: the task module plus its inference dependencies (what the API process
+  used to load when the Flask app and the tasks lived in the same module)
+
+and reports import time, process wall time, peak RSS and the heaviest imports
+(from python -X importtime). Run it inside the service image:
+
+    python -m services.startup_benchmark --runs 5
+    python -m services.startup_benchmark --service stt
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SERVICES = {
+    "stt": {"api": ["services.stt_api"], "worker": ["services.stt_tasks", "whisper"]},
+    "llm": {"api": ["services.llm_api"], "worker": ["services.llm_tasks", "huggingface_hub"]},
+    "tts": {"api": ["services.tts_api"], "worker": ["services.tts_tasks", "gtts"]},
+    "history": {"api": ["services.history_api"], "worker": []},
+}
+
+# Runs in the child interpreter: imports the modules and reports its own cost
+PROBE = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_seconds": elapsed, "max_rss_mb": rss_kb / 1024, "modules": len(sys.modules)}))
+"""
+
+
+def parse_importtime(stderr, top):
+    """Heaviest top-level packages from the -X importtime output: [(package, seconds)]."""
+    by_package = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        package = name.strip().split(".")[0]
+        by_package[package] = max(by_package.get(package, 0), int(cumulative) / 1e6)
+    return sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure(modules, runs, top):
+    """Median import/process time and peak RSS over `runs` fresh interpreters."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Keep the benchmark from polluting a real multiprocess metrics dir
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+    samples, heaviest = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, *modules],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+            return {"error": error}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["process_seconds"] = wall
+        samples.append(result)
+        heaviest = parse_importtime(proc.stderr, top)
+
+    return {
+        "import_seconds": statistics.median(s["import_seconds"] for s in samples),
+        "process_seconds": statistics.median(s["process_seconds"] for s in samples),
+        "max_rss_mb": statistics.median(s["max_rss_mb"] for s in samples),
+        "modules": samples[-1]["modules"],
+        "heaviest_imports": heaviest,
+    }
+
+
+def run(services, runs, top):
+    report = {}
+    for service in services:
+        report[service] = {}
+        for variant, modules in SERVICES[service].items():
+            if modules:
+                report[service][variant] = measure(modules, runs, top)
+    return report
+
+
+def print_report(report):
+    for service, variants in report.items():
+        print(f"\n📌 {service}")
+        print(f"{'variant':<8} {'import_s':>9} {'process_s':>10} {'max_rss_mb':>11} {'modules':>8}")
+        for variant, result in variants.items():
+            if "error" in result:
+                print(f"{variant:<8} ❌ {result['error']}")
+                continue
+            print(
+                f"{variant:<8} {result['import_seconds']:>9.3f} {result['process_seconds']:>10.3f} "
+                f"{result['max_rss_mb']:>11.1f} {result['modules']:>8}"
+            )
+
+        api, worker = variants.get("api", {}), variants.get("worker", {})
+        if "import_seconds" in api and "import_seconds" in worker:
+            print(
+                f"✅ API cold start {worker['process_seconds'] / api['process_seconds']:.1f}x faster, "
+                f"{worker['max_rss_mb'] - api['max_rss_mb']:.0f} MB less"
+            )
+        for variant, result in variants.items():
+            if result.get("heaviest_imports"):
+                heaviest = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["heaviest_imports"])
+                print(f"   {variant} heaviest imports: {heaviest}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API cold-start benchmark")
+    parser.add_argument("--service", choices=sorted(SERVICES), action="append", help="Default: all services")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports to list")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.service or sorted(SERVICES), args.runs, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,209 @@
+"""
+Audio decoding for the STT worker without spawning ffmpeg.
+
+Whisper's load_audio runs one ffmpeg subprocess per clip. The frontend and locust send
+PCM WAV, which is decoded here in-process into the float32 mono 16 kHz array Whisper
+expects (files above STT_MMAP_MIN_BYTES are memory-mapped instead of read), converting
+and downmixing one chunk of frames at a time. Resampling is done in-process too, with a
+chunked polyphase filter. Compressed codecs (mp3, ogg, m4a...) still go through
+Whisper's ffmpeg loader.
+"""
+import functools
+import math
+import os
+import struct
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # Whisper's input rate
+
+MMAP_MIN_BYTES = int(os.getenv("STT_MMAP_MIN_BYTES", 1024 * 1024))
+
+# Frames converted per step, output samples resampled per step
+DECODE_CHUNK_FRAMES = 64 * 1024
+RESAMPLE_CHUNK = 16 * 1024
+# Zero crossings of the resampling filter on each side of its center
+RESAMPLE_HALF_TAPS = 10
+
+# Decode paths, used as the "path" label of stt_decode_total
+DECODE_WAV = "wav"
+DECODE_WAV_MMAP = "wav_mmap"
+DECODE_FFMPEG = "ffmpeg"
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav_header(path):
+    """
+    (format_tag, channels, sample_rate, bits, data_offset, data_size) of a WAV file,
+    or None when the file is not a WAV this module can decode.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    format_tag = struct.unpack("<H", body[24:26])[0]  # First bytes of the SubFormat GUID
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                data_offset = f.tell()
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF: use the rest of the file
+                data_size = min(chunk_size, file_size - data_offset) or file_size - data_offset
+                format_tag, channels, sample_rate, bits = fmt
+                supported = (
+                    (format_tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32))
+                    or (format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64))
+                )
+                if not supported or channels < 1:
+                    return None
+                return format_tag, channels, sample_rate, bits, data_offset, data_size
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)  # Chunks are padded to an even size
+
+
+def _sample_layout(format_tag, bits):
+    """(numpy dtype, items per sample) of the raw data chunk."""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return (np.dtype("<f4") if bits == 32 else np.dtype("<f8")), 1
+    if bits == 24:
+        return np.dtype("u1"), 3  # No 3-byte dtype: read bytes, assembled per chunk
+    return {8: np.dtype("u1"), 16: np.dtype("<i2"), 32: np.dtype("<i4")}[bits], 1
+
+
+def _to_float(block, format_tag, bits, channels):
+    """float32 (frames, channels) in [-1, 1] of a block of raw frames."""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return block.astype(np.float32)
+    if bits == 8:
+        return (block.astype(np.float32) - 128.0) / 128.0
+    if bits == 24:
+        raw = block.reshape(len(block), channels, 3).astype(np.int32)
+        values = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+        return ((values ^ 0x800000) - 0x800000).astype(np.float32) / float(1 << 23)
+    return block.astype(np.float32) / float(1 << (bits - 1))
+
+
+def _read_mono(path, format_tag, channels, bits, data_offset, data_size):
+    """
+    Float32 mono samples in [-1, 1]. Returns (samples, mmapped).
+
+    Conversion and downmix run DECODE_CHUNK_FRAMES frames at a time into the output
+    array, so a memory-mapped file is never copied whole: only the pages of the current
+    chunk are resident next to the float32 mono result.
+    """
+    dtype, width = _sample_layout(format_tag, bits)
+    frame_items = channels * width
+    frames = data_size // (dtype.itemsize * frame_items)
+    mmapped = data_size >= MMAP_MIN_BYTES and frames > 0
+    if mmapped:
+        raw = np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(frames, frame_items))
+    else:
+        with open(path, "rb") as f:
+            f.seek(data_offset)
+            raw = np.fromfile(f, dtype=dtype, count=frames * frame_items).reshape(frames, frame_items)
+
+    mono = np.empty(frames, dtype=np.float32)
+    for start in range(0, frames, DECODE_CHUNK_FRAMES):
+        block = _to_float(raw[start:start + DECODE_CHUNK_FRAMES], format_tag, bits, channels)
+        mono[start:start + len(block)] = block[:, 0] if channels == 1 else block.mean(axis=1)
+    return mono, mmapped
+
+
+@functools.lru_cache(maxsize=16)
+def _polyphase_filter(up, down):
+    """
+    Kaiser-windowed sinc low-pass of the upsampled signal, split into its `up` phases.
+
+    Same design as scipy.signal.resample_poly: cutoff at the lower of the two Nyquist
+    rates, RESAMPLE_HALF_TAPS zero crossings per side, Kaiser beta 5.
+    """
+    max_rate = max(up, down)
+    half_len = RESAMPLE_HALF_TAPS * max_rate
+    taps = np.arange(2 * half_len + 1) - half_len
+    h = np.sinc(taps / max_rate) * np.kaiser(2 * half_len + 1, 5.0)
+    h *= up / h.sum()
+
+    # phases[p, k] = h[p + k * up]
+    taps_per_phase = -(-len(h) // up)
+    padded = np.zeros(taps_per_phase * up)
+    padded[:len(h)] = h
+    phases = padded.reshape(taps_per_phase, up).T.astype(np.float32)
+    return np.ascontiguousarray(phases), half_len
+
+
+def resample(audio, orig_rate, target_rate=SAMPLE_RATE):
+    """
+    Polyphase rational resampling (orig_rate * up / down), RESAMPLE_CHUNK samples at a time.
+
+    Output sample n is sum_k h[p + k*up] * x[t // up - k] with t = n*down + half_len and
+    p = t % up: only the taps that hit a non-zero sample of the upsampled signal are
+    computed, and memory stays proportional to the chunk, not to the clip.
+    """
+    if orig_rate == target_rate or len(audio) == 0:
+        return audio
+    g = math.gcd(orig_rate, target_rate)
+    up, down = target_rate // g, orig_rate // g
+    phases, half_len = _polyphase_filter(up, down)
+    taps_per_phase = phases.shape[1]
+    lags = np.arange(taps_per_phase)
+
+    out_length = -(-len(audio) * up // down)
+    resampled = np.empty(out_length, dtype=np.float32)
+    for start in range(0, out_length, RESAMPLE_CHUNK):
+        t = np.arange(start, min(start + RESAMPLE_CHUNK, out_length), dtype=np.int64) * down + half_len
+        index = (t // up)[:, None] - lags
+        values = audio.take(index, mode="clip")
+        if index[0, -1] < 0 or index[-1, 0] >= len(audio):
+            values[(index < 0) | (index >= len(audio))] = 0.0  # Zero padding at the edges
+        resampled[start:start + len(t)] = np.einsum("nk,nk->n", phases[t % up], values)
+    return resampled
+
+
+def decode_wav(path):
+    """Float32 mono 16 kHz array of a PCM/float WAV. Returns (audio, decode_path) or None."""
+    header = parse_wav_header(path)
+    if header is None:
+        return None
+    format_tag, channels, sample_rate, bits, data_offset, data_size = header
+
+    samples, mmapped = _read_mono(path, format_tag, channels, bits, data_offset, data_size)
+    audio = resample(samples, sample_rate)
+    return audio, DECODE_WAV_MMAP if mmapped else DECODE_WAV
+
+
+def load_audio(path):
+    """
+    Float32 mono 16 kHz array for model.transcribe and the decode path used.
+
+    WAV is decoded in-process; anything else (or a malformed WAV) goes through ffmpeg.
+    """
+    try:
+        decoded = decode_wav(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"❌ In-process WAV decode failed for {path}, using ffmpeg: {e}")
+        decoded = None
+    if decoded is not None:
+        return decoded
+
+    from whisper.audio import load_audio as ffmpeg_load_audio
+
+    return ffmpeg_load_audio(path, sr=SAMPLE_RATE), DECODE_FFMPEG
@@ -0,0 +1,170 @@
+"""
+Whisper model shared across the STT prefork children.
+
+The worker parent loads the model before forking the pool (celeryd_init), so every
+child maps the same copy of the weights instead of loading its own:
+
+- WHISPER_MODEL: model name (default: base)
+- WHISPER_SHARED_WEIGHTS: "cow" (copy-on-write pages inherited from the parent, default),
+  "shm" (weights moved to /dev/shm, needs shm_size in docker-compose) or "off"
+  (every child loads its own copy on first use)
+
+Check unique vs shared memory per child with:
+
+    python -m services.stt_model memory-report
+"""
+import argparse
+import gc
+import os
+
+# Whisper model configuration
+whisper_config = {
+    "model": os.getenv("WHISPER_MODEL", "base"),
+    "shared_weights": os.getenv("WHISPER_SHARED_WEIGHTS", "cow").lower(),
+}
+
+_model = None
+
+
+def get_model():
+    """Returns the process-wide Whisper model, loading it on first use."""
+    global _model
+    if _model is None:
+        import whisper
+
+        _model = whisper.load_model(whisper_config["model"], device="cpu")
+        _model.eval()
+    return _model
+
+
+def preload_shared_model():
+    """
+    Loads the model in the worker parent, before the pool forks.
+
+    Inference never writes to the weights, so children keep sharing the parent's pages.
+    """
+    if whisper_config["shared_weights"] == "off":
+        return None
+
+    import torch
+
+    # Keep the parent single-threaded: an OpenMP pool started before fork is not usable in children
+    torch.set_num_threads(1)
+    model = get_model()
+    for param in model.parameters():
+        param.requires_grad_(False)
+
+    if whisper_config["shared_weights"] == "shm":
+        model.share_memory()
+
+    # Keep the GC from touching (and so copying) the pages of objects created so far
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Whisper '{whisper_config['model']}' preloaded for the pool ({whisper_config['shared_weights']})")
+    return model
+
+
+# Memory report
+
+def _read_rollup(pid):
+    """Memory counters (kB) from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields
+
+
+def _argv(pid):
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().decode(errors="replace").split("\0")
+
+
+def _cmdline(pid):
+    return " ".join(_argv(pid)).strip()
+
+
+def _parent_pid(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # The process name may contain spaces, the fields after ")" don't
+        return int(f.read().rsplit(")", 1)[1].split()[1])
+
+
+def _pids():
+    return [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+
+
+def find_worker_parents(pattern="worker"):
+    """Celery worker main processes whose command line matches the pattern."""
+    matches = set()
+    for pid in _pids():
+        try:
+            argv = _argv(pid)
+        except OSError:
+            continue
+        # "celery ..." or "python .../celery ...", not the "sh -c" wrapper that launched it
+        is_celery = any(os.path.basename(arg) == "celery" for arg in argv[:2])
+        if is_celery and pattern in " ".join(argv):
+            matches.add(pid)
+
+    parents = []
+    for pid in matches:
+        try:
+            if _parent_pid(pid) not in matches:
+                parents.append(pid)
+        except OSError:
+            continue
+    return sorted(parents)
+
+
+def children_of(parent_pid):
+    children = []
+    for pid in _pids():
+        try:
+            if _parent_pid(pid) == parent_pid:
+                children.append(pid)
+        except OSError:
+            continue
+    return sorted(children)
+
+
+def memory_report(parent_pid):
+    """Returns rows of (pid, role, rss, pss, unique, shared) in MB."""
+    rows = []
+    for role, pid in [("parent", parent_pid)] + [("child", c) for c in children_of(parent_pid)]:
+        try:
+            mem = _read_rollup(pid)
+        except OSError:
+            continue
+        unique = mem.get("Private_Clean", 0) + mem.get("Private_Dirty", 0)
+        shared = mem.get("Shared_Clean", 0) + mem.get("Shared_Dirty", 0)
+        rows.append((pid, role, mem.get("Rss", 0) / 1024, mem.get("Pss", 0) / 1024, unique / 1024, shared / 1024))
+    return rows
+
+
+def print_memory_report(parent_pid):
+    rows = memory_report(parent_pid)
+    print(f"📌 Worker {parent_pid}: {_cmdline(parent_pid)}")
+    print(f"{'pid':>8} {'role':<7} {'rss_mb':>9} {'pss_mb':>9} {'unique_mb':>10} {'shared_mb':>10}")
+    for pid, role, rss, pss, unique, shared in rows:
+        print(f"{pid:>8} {role:<7} {rss:>9.1f} {pss:>9.1f} {unique:>10.1f} {shared:>10.1f}")
+
+    total_pss = sum(row[3] for row in rows)
+    print(f"Total PSS (real footprint of the pool): {total_pss:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whisper model sharing tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("memory-report", help="Unique vs shared RSS per worker child")
+    report_parser.add_argument("--pid", type=int, default=None, help="Worker parent PID (default: autodetect)")
+    report_parser.add_argument("--pattern", default="-Q stt", help="Command line pattern to find the worker")
+    args = parser.parse_args()
+
+    parent_pids = [args.pid] if args.pid else find_worker_parents(args.pattern)
+    if not parent_pids:
+        print("❌ No Celery worker found")
+    for parent_pid in parent_pids:
+        print_memory_report(parent_pid)
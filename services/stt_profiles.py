@@ -0,0 +1,101 @@
+"""
+Whisper decoding profiles, selectable per request on /stt ("profile" form field).
+
+Whisper's defaults detect the language on every clip, re-decode at higher temperatures
+when a result looks wrong and condition each window on the previous text. Our traffic
+is mostly short English utterances, so the faster profiles pin the language and cut the
+fallback schedule:
+
+- fast: fixed language, greedy decoding, no temperature fallback
+- balanced: fixed language, greedy decoding, short fallback schedule
+- accurate: language detection, beam search, Whisper's full fallback schedule
+
+The service default is STT_DEFAULT_PROFILE; STT_LANGUAGE sets the fixed language.
+Compare the profiles (latency and transcript) on a clip with:
+
+    python -m services.stt_profiles compare
+"""
+import argparse
+import os
+import statistics
+import time
+
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en")
+
+# Keyword arguments for whisper's model.transcribe
+STT_PROFILES = {
+    "fast": {
+        "language": STT_LANGUAGE,
+        "beam_size": None,
+        "temperature": (0.0,),
+        "condition_on_previous_text": False,
+        "no_speech_threshold": 0.6,
+        "logprob_threshold": -1.0,
+        "compression_ratio_threshold": 2.4,
+    },
+    "balanced": {
+        "language": STT_LANGUAGE,
+        "beam_size": None,
+        "best_of": 2,
+        "temperature": (0.0, 0.4, 0.8),
+        "condition_on_previous_text": False,
+        "no_speech_threshold": 0.6,
+        "logprob_threshold": -1.0,
+        "compression_ratio_threshold": 2.4,
+    },
+    "accurate": {
+        "language": None,  # Detected on every clip
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "condition_on_previous_text": True,
+        "no_speech_threshold": 0.6,
+        "logprob_threshold": -1.0,
+        "compression_ratio_threshold": 2.4,
+    },
+}
+
+DEFAULT_PROFILE = os.getenv("STT_DEFAULT_PROFILE", "balanced")
+
+
+def resolve_profile(profile=None):
+    """Validates the requested profile name (None = service default). Raises ValueError."""
+    profile = (profile or DEFAULT_PROFILE).lower()
+    if profile not in STT_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', use one of {sorted(STT_PROFILES)}")
+    return profile
+
+
+def transcribe_options(profile):
+    """model.transcribe keyword arguments for the profile (CPU, so no fp16)."""
+    return dict(STT_PROFILES[profile], fp16=False)
+
+
+def compare(audio_path, model_name, runs):
+    """Median latency and transcript of every profile on the same clip."""
+    import whisper
+
+    model = whisper.load_model(model_name, device="cpu")
+    model.transcribe(audio_path, **transcribe_options("fast"))  # Warm-up
+
+    print(f"{'profile':<10} {'median_s':>9}  transcript")
+    for profile in STT_PROFILES:
+        durations = []
+        for _ in range(runs):
+            start = time.time()
+            text = model.transcribe(audio_path, **transcribe_options(profile))["text"]
+            durations.append(time.time() - start)
+        print(f"{profile:<10} {statistics.median(durations):>9.3f}  {text.strip()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whisper decoding profiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Latency and transcript per profile")
+    compare_parser.add_argument("--audio", default=os.path.join(os.path.dirname(__file__), "stt_audio_01.wav"))
+    compare_parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"))
+    compare_parser.add_argument("--runs", type=int, default=3)
+
+    args = parser.parse_args()
+    compare(args.audio, args.model, args.runs)
@@ -0,0 +1,178 @@
+"""
+STT worker: Celery task that runs Whisper. Only the worker imports this module,
+the HTTP API (services/stt_api.py) sends tasks by name.
+"""
+import os
+import sys
+import time
+import psycopg2
+from celery.signals import worker_process_init, celeryd_init
+from billiard.process import current_process
+from dotenv import load_dotenv
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.celery_config import make_celery
+from services.stt_topology import stt_topology, limit_thread_env, configure_process
+
+# Cap OpenMP/BLAS threads before numpy, whisper (and torch) get imported
+limit_thread_env(stt_topology["threads"])
+
+from services.stt_model import get_model, preload_shared_model
+from services.stt_profiles import resolve_profile, transcribe_options
+from services.stt_audio import load_audio
+from services.history_schema import ensure_postgres_schema
+from services.task_resilience import breaker, run_step, clear_checkpoints, retry_task, is_last_attempt
+from prometheus_client import Counter, Histogram
+
+# Load .env file
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "vars.env")))
+
+# Metrics definition
+STT_REQUEST_COUNT = Counter("stt_request_count", "Total de requisições recebidas")
+STT_LATENCY = Histogram("stt_latency_seconds", "Tempo de processamento da transcrição")
+STT_AUDIO_SIZE = Histogram("stt_audio_size_bytes", "Tamanho do arquivo de áudio recebido")
+STT_DECODE_COUNT = Counter("stt_decode_total", "Áudios decodificados por caminho (wav, wav_mmap, ffmpeg)", ["path"])
+STT_DECODE_SECONDS = Histogram(
+    "stt_decode_seconds", "Tempo de decodificação do áudio por caminho", ["path"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+STT_PROFILE_LATENCY = Histogram(
+    "stt_profile_latency_seconds", "Tempo de transcrição por perfil de decodificação", ["profile"]
+)
+
+
+# Fetch database connection from environment variables
+db_config = {
+    "dbname": os.getenv("POSTGRES_DB", "stt_service"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "mypassword"),
+    "host": os.getenv("POSTGRES_HOST", "postgres_stt"),
+    "port": int(os.getenv("POSTGRES_PORT", 5432))
+}
+
+celery = make_celery("services.stt_tasks")
+
+# Whether this worker consumes the stt queue, set in the parent before the pool forks.
+# services/celery_worker.py loads this module in the llm@ and tts@ workers too.
+_stt_worker = False
+
+
+# Load Whisper once in the worker parent so the prefork children share its weights
+@celeryd_init.connect
+def preload_whisper(options=None, **kwargs):
+    global _stt_worker
+    queues = (options or {}).get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    _stt_worker = "stt" in queues
+    if _stt_worker:
+        preload_shared_model()
+
+
+# Apply the STT topology (threads per process, CPU affinity) to every prefork child of the stt worker
+@worker_process_init.connect
+def configure_stt_process(**kwargs):
+    if not _stt_worker:
+        return
+    index = getattr(current_process(), "index", 0) or 0
+    configure_process(index)
+    print(f"STT worker process {index}: {stt_topology['threads']} torch threads, affinity={stt_topology['affinity']}")
+
+
+# Celery Task to handle STT transcription
+@celery.task(bind=True, name="transcribe_audio")
+def transcribe_audio(self, audio_path, audio_filename, interaction_id=None, profile=None):
+
+    try:
+        # Request metrics (first attempt only)
+        if not self.request.retries:
+            STT_REQUEST_COUNT.inc()
+
+        # Each step is checkpointed: a retry only re-runs the steps that did not complete
+        transcription = run_step(self, "transcribe", transcribe, audio_path, audio_filename, resolve_profile(profile))
+        run_step(self, "persist", save_transcription, audio_path, audio_filename, transcription, interaction_id)
+
+        clear_checkpoints(self)
+        remove_upload(audio_path)
+        return transcription
+
+    except Exception as e:
+        # The upload is only needed by the retries, drop it when the task gives up
+        if is_last_attempt(self):
+            remove_upload(audio_path)
+        raise retry_task(self, e)
+
+
+def remove_upload(audio_path):
+    """Deletes the uploaded file from the shared upload volume."""
+    try:
+        os.remove(audio_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"❌ Could not remove upload {audio_path}: {e}")
+
+
+def transcribe(audio_path, audio_filename, profile):
+    start_time = time.time()
+    print(f"Transcribing audio file: {audio_filename} (profile: {profile})")
+
+    # Audio size metrics
+    audio_size = os.path.getsize(audio_path)
+    STT_AUDIO_SIZE.observe(audio_size)
+    print(f"Audio size metrics: {audio_size}")
+
+    # PCM WAV is decoded in-process, only compressed codecs spawn ffmpeg
+    decode_start = time.time()
+    audio, decode_path = load_audio(audio_path)
+    STT_DECODE_COUNT.labels(decode_path).inc()
+    STT_DECODE_SECONDS.labels(decode_path).observe(time.time() - decode_start)
+
+    model = get_model()
+    result = model.transcribe(audio, **transcribe_options(profile))
+
+    # Latency metrics
+    duration = time.time() - start_time
+    STT_LATENCY.observe(duration)
+    STT_PROFILE_LATENCY.labels(profile).observe(duration)
+    print(f"Latency Metrics: {duration}")
+    return result["text"]
+
+
+def save_transcription(audio_path, audio_filename, transcription, interaction_id):
+    """Saves transcription and audio to PostgreSQL. Returns the inserted id."""
+    # Local IO stays outside the breaker, only database errors count against postgres_stt
+    with open(audio_path, "rb") as audio_file:
+        audio_binary = audio_file.read()
+
+    return breaker("postgres_stt").call(
+        insert_transcription, audio_filename, transcription, interaction_id, audio_binary
+    )
+
+
+def insert_transcription(audio_filename, transcription, interaction_id, audio_binary):
+    conn = psycopg2.connect(**db_config)
+    try:
+        cursor = conn.cursor()
+
+        # Create (or migrate) the partitioned table and its indexes, once per process
+        ensure_postgres_schema(conn, "stt_transcriptions")
+
+        # Insert the data
+        cursor.execute(
+            """
+            INSERT INTO stt_transcriptions (interaction_id, audio_filename, transcription, audio_data)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id;
+            """,
+            (interaction_id, audio_filename, transcription, psycopg2.Binary(audio_binary))
+        )
+
+        inserted_id = cursor.fetchone()[0]  # Get the inserted row ID
+        conn.commit()
+        print(f"✅ Data inserted successfully! Inserted ID: {inserted_id}")
+        cursor.close()
+        return inserted_id
+
+    finally:
+        conn.close()
+        print("🔍 Connection closed.")
@@ -0,0 +1,171 @@
+"""
+CPU topology for the STT workers.
+
+Each prefork child that runs Whisper starts PyTorch's intra-op thread pool, which by
+default is sized to every core of the node. With N children that means N x cores
+threads fighting each other. The layout below sets together:
+
+- STT_WORKER_PROCESSES: prefork children for the stt queue (default: cores // threads)
+- STT_TORCH_THREADS: PyTorch threads per child (default: 1)
+- STT_CPU_AFFINITY: "none" or "auto" (pin each child to its own block of cores)
+
+Find the best layout for the host with:
+
+    python -m services.stt_topology calibrate
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+from services.stt_profiles import resolve_profile, transcribe_options
+
+DEFAULT_AUDIO_PATH = os.path.join(os.path.dirname(__file__), "stt_audio_01.wav")
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cpus():
+    """CPUs this process is allowed to run on (respects container cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def load_topology():
+    threads = max(int(os.getenv("STT_TORCH_THREADS", 1)), 1)
+    processes = int(os.getenv("STT_WORKER_PROCESSES", 0)) or max(len(available_cpus()) // threads, 1)
+    return {
+        "processes": processes,
+        "threads": threads,
+        "affinity": os.getenv("STT_CPU_AFFINITY", "none").lower(),
+    }
+
+
+# STT worker topology
+stt_topology = load_topology()
+
+
+def limit_thread_env(threads):
+    """Caps OpenMP/MKL pools. Only effective if called before numpy and torch are imported."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+
+def cpus_for_process(index, threads, cpus=None):
+    """Block of `threads` cores for the child with the given pool index."""
+    cpus = cpus or available_cpus()
+    start = (index * threads) % len(cpus)
+    return [cpus[(start + i) % len(cpus)] for i in range(min(threads, len(cpus)))]
+
+
+def configure_process(index, threads=None, affinity=None):
+    """Applies the thread count (and optional CPU pinning) to the current process."""
+    threads = threads or stt_topology["threads"]
+    affinity = affinity or stt_topology["affinity"]
+
+    limit_thread_env(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once, before any inter-op work started
+        pass
+
+    if affinity == "auto" and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus_for_process(index, threads))
+
+
+# Calibration
+
+_model = None
+
+
+def _calibration_init(threads, affinity, model_name, audio_path, barrier, counter):
+    global _model
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    limit_thread_env(threads)
+    configure_process(index, threads, affinity)
+
+    import whisper
+
+    _model = whisper.load_model(model_name, device="cpu")
+    _model.transcribe(audio_path, **transcribe_options(resolve_profile()))  # Warm-up
+    barrier.wait()
+
+
+def _calibration_clip(audio_path):
+    start = time.time()
+    _model.transcribe(audio_path, **transcribe_options(resolve_profile()))
+    return start, time.time()
+
+
+def candidate_layouts(cpu_count):
+    """(processes, threads) pairs that don't oversubscribe the host."""
+    thread_options = [t for t in (1, 2, 4, 8, 16) if t <= cpu_count]
+    layouts = []
+    for threads in thread_options:
+        max_processes = cpu_count // threads
+        process_options = sorted({p for p in (1, 2, 4, 8, 16, max_processes) if p <= max_processes})
+        layouts.extend((processes, threads) for processes in process_options)
+    return layouts
+
+
+def measure_layout(processes, threads, affinity, clips, model_name, audio_path):
+    """Returns clips/second transcribed with the given layout (model load excluded)."""
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(processes)
+    counter = ctx.Value("i", 0)
+    with ctx.Pool(
+        processes,
+        initializer=_calibration_init,
+        initargs=(threads, affinity, model_name, audio_path, barrier, counter),
+    ) as pool:
+        timings = pool.map(_calibration_clip, [audio_path] * clips, chunksize=1)
+
+    elapsed = max(end for _, end in timings) - min(start for start, _ in timings)
+    return clips / elapsed
+
+
+def calibrate(clips=None, model_name="base", audio_path=DEFAULT_AUDIO_PATH, affinities=("none", "auto")):
+    cpu_count = len(available_cpus())
+    results = []
+    print(f"🔍 Calibrating STT layouts on {cpu_count} CPUs with {audio_path}")
+
+    for (processes, threads), affinity in itertools.product(candidate_layouts(cpu_count), affinities):
+        n_clips = clips or processes * 4
+        throughput = measure_layout(processes, threads, affinity, n_clips, model_name, audio_path)
+        results.append((throughput, processes, threads, affinity))
+        print(f"processes={processes:<3} threads={threads:<3} affinity={affinity:<5} {throughput:.2f} clips/s")
+
+    throughput, processes, threads, affinity = max(results)
+    print(f"\n✅ Best layout: {throughput:.2f} clips/s")
+    print(f"STT_WORKER_PROCESSES={processes}")
+    print(f"STT_TORCH_THREADS={threads}")
+    print(f"STT_CPU_AFFINITY={affinity}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="STT worker topology")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("processes", help="Print the configured prefork concurrency")
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="Sweep layouts and report the fastest")
+    calibrate_parser.add_argument("--clips", type=int, default=None, help="Clips per layout (default: 4 per process)")
+    calibrate_parser.add_argument("--model", default="base")
+    calibrate_parser.add_argument("--audio", default=DEFAULT_AUDIO_PATH)
+    calibrate_parser.add_argument("--no-affinity", action="store_true", help="Only test unpinned layouts")
+
+    args = parser.parse_args()
+    if args.command == "processes":
+        print(stt_topology["processes"])
+    else:
+        calibrate(args.clips, args.model, args.audio, ("none",) if args.no_affinity else ("none", "auto"))
@@ -0,0 +1,180 @@
+"""
+Retry helpers shared by the worker tasks.
+
+- Checkpoints: the result of each completed step is stored in Redis under the task id
+  (which Celery keeps across retries), so a retry resumes after the last completed step
+  instead of re-running Whisper/LLM/gTTS when only the database write failed.
+- Backoff: retries wait a random delay in [0, min(cap, base * 2^retries)] ("full jitter"),
+  so failed tasks do not come back all at the same time.
+- Circuit breakers: one per external dependency, shared by every worker through Redis.
+  After CIRCUIT_FAILURE_THRESHOLD consecutive failures the circuit opens and calls fail
+  fast for CIRCUIT_RESET_TIMEOUT seconds; then a single probe call is let through
+  (half-open) and its outcome closes or re-opens the circuit.
+"""
+import json
+import os
+import random
+import time
+
+import redis
+from prometheus_client import Counter, Gauge
+
+from shared.celery_config import CELERY_RESULT_BACKEND
+
+# Retry / circuit breaker configuration
+resilience_config = {
+    "redis_url": os.getenv("RESILIENCE_REDIS_URL", CELERY_RESULT_BACKEND),
+    "max_retries": int(os.getenv("TASK_MAX_RETRIES", 5)),
+    "backoff_base": float(os.getenv("TASK_RETRY_BACKOFF_BASE", 2)),
+    "backoff_max": float(os.getenv("TASK_RETRY_BACKOFF_MAX", 120)),
+    "checkpoint_ttl": int(os.getenv("TASK_CHECKPOINT_TTL", 86400)),
+    "failure_threshold": int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5)),
+    "reset_timeout": float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30)),
+}
+
+CHECKPOINT_KEY = "checkpoint:{task_id}"
+CIRCUIT_KEY = "circuit:{name}"
+CIRCUIT_PROBE_KEY = "circuit:{name}:probe"
+
+# Gauge values of circuit_breaker_state
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+# Metrics definition
+TASK_RETRIES = Counter("task_retries_total", "Retentativas agendadas por tarefa", ["task"])
+CHECKPOINT_HITS = Counter("task_checkpoint_hits_total", "Etapas reaproveitadas de um checkpoint", ["task", "step"])
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state", "Estado do circuit breaker (0 fechado, 1 meio-aberto, 2 aberto)", ["dependency"],
+    multiprocess_mode="mostrecent",
+)
+CIRCUIT_REJECTIONS = Counter("circuit_breaker_rejections_total", "Chamadas recusadas com o circuito aberto", ["dependency"])
+CIRCUIT_FAILURES = Counter("circuit_breaker_failures_total", "Falhas registradas por dependência", ["dependency"])
+
+_redis_client = None
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(resilience_config["redis_url"])
+    return _redis_client
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or resilience_config["failure_threshold"]
+        self.reset_timeout = reset_timeout or resilience_config["reset_timeout"]
+        self.key = CIRCUIT_KEY.format(name=name)
+        self.probe_key = CIRCUIT_PROBE_KEY.format(name=name)
+
+    def before_call(self):
+        """Raises CircuitOpenError while the circuit is open. Returns True for the half-open probe."""
+        opened_at = get_redis().hget(self.key, "opened_at")
+        if opened_at is None:
+            return False
+
+        remaining = float(opened_at) + self.reset_timeout - time.time()
+        if remaining <= 0 and get_redis().set(self.probe_key, 1, nx=True, ex=int(self.reset_timeout) or 1):
+            CIRCUIT_STATE.labels(self.name).set(HALF_OPEN)
+            return True
+
+        CIRCUIT_REJECTIONS.labels(self.name).inc()
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+
+    def record_success(self):
+        get_redis().delete(self.key, self.probe_key)
+        CIRCUIT_STATE.labels(self.name).set(CLOSED)
+
+    def record_failure(self, probe=False):
+        CIRCUIT_FAILURES.labels(self.name).inc()
+        pipe = get_redis().pipeline()
+        pipe.hincrby(self.key, "failures", 1)
+        pipe.hget(self.key, "opened_at")
+        failures, opened_at = pipe.execute()
+
+        if probe or (opened_at is None and failures >= self.failure_threshold):
+            pipe = get_redis().pipeline()
+            pipe.hset(self.key, "opened_at", time.time())
+            pipe.delete(self.probe_key)
+            pipe.execute()
+            CIRCUIT_STATE.labels(self.name).set(OPEN)
+            print(f"❌ Circuit '{self.name}' opened after {failures} consecutive failures")
+
+    def call(self, func, *args, **kwargs):
+        probe = self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure(probe)
+            raise
+        self.record_success()
+        return result
+
+
+# One breaker per external dependency
+BREAKERS = {}
+
+
+def breaker(name):
+    if name not in BREAKERS:
+        BREAKERS[name] = CircuitBreaker(name)
+    return BREAKERS[name]
+
+
+def run_step(task, step, func, *args, **kwargs):
+    """
+    Runs one step of the task, or returns its checkpointed result from a previous attempt.
+
+    The result must be JSON serializable.
+    """
+    key = CHECKPOINT_KEY.format(task_id=task.request.id)
+    cached = get_redis().hget(key, step)
+    if cached is not None:
+        CHECKPOINT_HITS.labels(task.name, step).inc()
+        print(f"♻️ {task.name}: step '{step}' restored from checkpoint")
+        return json.loads(cached)
+
+    result = func(*args, **kwargs)
+    pipe = get_redis().pipeline()
+    pipe.hset(key, step, json.dumps(result))
+    pipe.expire(key, resilience_config["checkpoint_ttl"])
+    pipe.execute()
+    return result
+
+
+def clear_checkpoints(task):
+    get_redis().delete(CHECKPOINT_KEY.format(task_id=task.request.id))
+
+
+def backoff_countdown(retries):
+    """Exponential backoff with full jitter, in seconds."""
+    cap = min(resilience_config["backoff_max"], resilience_config["backoff_base"] * (2 ** retries))
+    return random.uniform(0, cap)
+
+
+def is_last_attempt(task):
+    """True when a failure of the current attempt is final (no retry left)."""
+    return task.request.retries >= resilience_config["max_retries"]
+
+
+def retry_task(task, exc):
+    """
+    task.retry with jittered exponential backoff (to be raised by the caller).
+
+    With an open circuit the retry is scheduled after the circuit's reset timeout.
+    """
+    countdown = backoff_countdown(task.request.retries)
+    if isinstance(exc, CircuitOpenError):
+        countdown = max(countdown, exc.retry_after + random.uniform(0, resilience_config["backoff_base"]))
+    TASK_RETRIES.labels(task.name).inc()
+    print(f"❌ {task.name} failed ({exc}), retry {task.request.retries + 1} in {countdown:.1f}s")
+    return task.retry(exc=exc, countdown=countdown, max_retries=resilience_config["max_retries"])
@@ -0,0 +1,126 @@
+"""
+Output formats for the TTS service (gTTS is only imported by the worker).
+
+gTTS always produces MP3 (24 kHz mono, ~32 kbps). Any other codec or bitrate is
+transcoded with ffmpeg. File names are content-addressed (hash of text, language,
+format and bitrate), so a generated file never changes and can be cached forever.
+"""
+import hashlib
+import io
+import os
+import re
+import subprocess
+import tempfile
+
+# Directory where generated audio is stored and served from
+AUDIO_DIR = os.getenv("TTS_AUDIO_DIR", "/app")
+
+# Output formats accepted by /tts
+AUDIO_FORMATS = {
+    "mp3": {"extension": "mp3", "mimetype": "audio/mpeg", "codec": ["-c:a", "libmp3lame"]},
+    # Opus in VoIP mode is tuned for speech and stays intelligible at 12-16 kbps
+    "opus": {"extension": "ogg", "mimetype": "audio/ogg", "codec": ["-c:a", "libopus", "-application", "voip"]},
+    "aac": {"extension": "m4a", "mimetype": "audio/mp4", "codec": ["-c:a", "aac", "-movflags", "+faststart"]},
+}
+
+# Named speech-optimized presets: (format, bitrate)
+AUDIO_PRESETS = {
+    "speech_low": ("opus", "12k"),
+    "speech": ("opus", "24k"),
+}
+
+ALLOWED_BITRATES = ("12k", "16k", "24k", "32k", "48k", "64k", "96k", "128k")
+
+DEFAULT_FORMAT = "mp3"
+
+# <32 hex chars>.<extension>, only these names are immutable
+CONTENT_ADDRESSED_NAME = re.compile(
+    r"^(?P<digest>[0-9a-f]{32})\.(?:%s)$" % "|".join(f["extension"] for f in AUDIO_FORMATS.values())
+)
+
+
+def resolve_format(audio_format=None, bitrate=None):
+    """
+    Validates the requested format/bitrate and returns (format, bitrate).
+
+    bitrate None means "keep gTTS' native MP3" for mp3, or the codec default otherwise.
+    Raises ValueError for unknown values.
+    """
+    audio_format = (audio_format or DEFAULT_FORMAT).lower()
+    if audio_format in AUDIO_PRESETS:
+        # A preset only sets defaults, an explicit bitrate goes through the same checks
+        audio_format, preset_bitrate = AUDIO_PRESETS[audio_format]
+        if bitrate is None:
+            return audio_format, preset_bitrate
+
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown format '{audio_format}', use one of {sorted(AUDIO_FORMATS) + sorted(AUDIO_PRESETS)}")
+    if bitrate is not None:
+        bitrate = str(bitrate).lower()
+        if bitrate.isdigit():
+            bitrate = f"{bitrate}k"
+        if bitrate not in ALLOWED_BITRATES:
+            raise ValueError(f"Unsupported bitrate '{bitrate}', use one of {list(ALLOWED_BITRATES)}")
+    return audio_format, bitrate
+
+
+def audio_filename_for(text, lang, audio_format, bitrate):
+    key = "\0".join([lang, audio_format, bitrate or "native", text])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return f"{digest}.{AUDIO_FORMATS[audio_format]['extension']}"
+
+
+def mimetype_for(filename):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    for audio_format in AUDIO_FORMATS.values():
+        if audio_format["extension"] == extension:
+            return audio_format["mimetype"]
+    return "application/octet-stream"
+
+
+def _transcode(mp3_bytes, output_path, audio_format, bitrate):
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-f", "mp3", "-i", "pipe:0", "-ac", "1"]
+    command += AUDIO_FORMATS[audio_format]["codec"]
+    if bitrate:
+        command += ["-b:a", bitrate]
+    command.append(output_path)
+    subprocess.run(command, input=mp3_bytes, check=True, capture_output=True)
+
+
+def synthesize(text, audio_dir, lang="en", audio_format=DEFAULT_FORMAT, bitrate=None, breaker=None):
+    """
+    Generates the audio file (or reuses it when the same request was already served).
+
+    The gTTS request goes through `breaker` (a CircuitBreaker) when given.
+
+    Returns (filename, path, cache_hit).
+    """
+    filename = audio_filename_for(text, lang, audio_format, bitrate)
+    path = os.path.join(audio_dir, filename)
+    if os.path.exists(path):
+        return filename, path, True
+
+    from gtts import gTTS
+
+    mp3_buffer = io.BytesIO()
+    if breaker is not None:
+        breaker.call(gTTS(text=text, lang=lang).write_to_fp, mp3_buffer)
+    else:
+        gTTS(text=text, lang=lang).write_to_fp(mp3_buffer)
+
+    # Write next to the target and rename, readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=audio_dir, suffix=f".{AUDIO_FORMATS[audio_format]['extension']}")
+    try:
+        if audio_format == "mp3" and bitrate is None:
+            with os.fdopen(fd, "wb") as f:
+                f.write(mp3_buffer.getvalue())
+        else:
+            os.close(fd)
+            _transcode(mp3_buffer.getvalue(), tmp_path, audio_format, bitrate)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return filename, path, False
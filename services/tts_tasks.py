@@ -0,0 +1,108 @@
+"""
+TTS worker: Celery task that synthesizes speech with gTTS. Only the worker imports
+this module, the HTTP API (services/tts_api.py) sends tasks by name.
+"""
+import os
+import sys
+import time
+import psycopg2
+from dotenv import load_dotenv
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.celery_config import make_celery
+from services.tts_audio import synthesize, AUDIO_DIR
+from services.history_schema import ensure_postgres_schema
+from services.task_resilience import breaker, run_step, clear_checkpoints, retry_task
+from prometheus_client import Counter, Histogram
+
+# Load .env file
+load_dotenv(dotenv_path=os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "vars.env")))
+
+# Metrics definition
+TTS_REQUEST_COUNT = Counter("tts_request_count", "Total de requisições ao TTS")
+TTS_LATENCY = Histogram("tts_latency_seconds", "Tempo de geração do áudio")
+TTS_TEXT_SIZE = Histogram("tts_text_size_bytes", "Tamanho do texto recebido")
+
+db_config = {
+    "dbname": os.getenv("POSTGRES_DB", "tts_service"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "mypassword"),
+    "host": os.getenv("POSTGRES_HOST", "postgres_tts"),  # MUST MATCH DOCKER COMPOSE
+    "port": int(os.getenv("POSTGRES_PORT", 5432))  # Default PostgreSQL port
+}
+
+# Ensure audio directory exists
+os.makedirs(AUDIO_DIR, exist_ok=True)
+
+celery = make_celery("services.tts_tasks")
+
+
+# Celery Task to generate TTS audio and save it to PostgreSQL
+@celery.task(bind=True, name="generate_tts_audio")
+def generate_tts_audio(self, text, audio_format="mp3", bitrate=None, interaction_id=None):
+    try:
+        print(f"Generating TTS audio ({audio_format}, {bitrate or 'native'}) for text: {text}")
+
+        # Request metrics (first attempt only)
+        if not self.request.retries:
+            TTS_REQUEST_COUNT.inc()
+            TTS_TEXT_SIZE.observe(len(text))
+
+        # Each step is checkpointed: a retry only re-runs the steps that did not complete
+        audio_filename, audio_path = run_step(self, "synthesize", generate_audio, text, audio_format, bitrate)
+        run_step(self, "persist", save_audio, text, audio_filename, audio_path, interaction_id)
+
+        clear_checkpoints(self)
+        return audio_filename
+
+    except Exception as e:
+        raise retry_task(self, e)
+
+
+def generate_audio(text, audio_format, bitrate):
+    start_time = time.time()
+
+    # Generate TTS audio (reused if the same text/format was already synthesized)
+    audio_filename, audio_path, cache_hit = synthesize(
+        text, AUDIO_DIR, lang='en', audio_format=audio_format, bitrate=bitrate, breaker=breaker("gtts")
+    )
+
+    # Latency metrics
+    duration = time.time() - start_time
+    TTS_LATENCY.observe(duration)
+
+    print(f"Salvou o audio: {audio_filename} (cache hit: {cache_hit})")
+    return audio_filename, audio_path
+
+
+def save_audio(text, audio_filename, audio_path, interaction_id):
+    """Saves text and audio to PostgreSQL. Returns the inserted id."""
+    # Local IO stays outside the breaker, only database errors count against postgres_tts
+    with open(audio_path, "rb") as audio_file:
+        audio_binary = audio_file.read()
+
+    return breaker("postgres_tts").call(insert_audio, text, audio_filename, interaction_id, audio_binary)
+
+
+def insert_audio(text, audio_filename, interaction_id, audio_binary):
+    conn = psycopg2.connect(**db_config)
+    try:
+        cursor = conn.cursor()
+
+        # Create (or migrate) the partitioned table and its indexes, once per process
+        ensure_postgres_schema(conn, "tts_results")
+
+        cursor.execute("""
+            INSERT INTO tts_results (interaction_id, text, audio_filename, audio_data)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id;
+        """, (interaction_id, text, audio_filename, psycopg2.Binary(audio_binary)))
+
+        inserted_id = cursor.fetchone()[0]  # Get the inserted row ID
+        conn.commit()
+        print(f"✅ Data inserted successfully! Inserted ID: {inserted_id}")
+        cursor.close()
+        return inserted_id
+
+    finally:
+        conn.close()
+        print("🔍 Connection closed.")
@@ -0,0 +1,120 @@
+import os
+from celery import group, states
+from celery.result import GroupResult
+from flask import request, jsonify
+
+from shared.traffic_capture import record_completions
+
+# Upper bound of items accepted by one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 1000))
+
+
+def submit_batch(celery, task_name, args_list, routing_key):
+    """
+    Enqueues one task per args as a Celery group (published over a single connection).
+
+    The group is saved in the result backend so its status can be read by group id.
+    """
+    job = group(
+        [celery.signature(task_name, args=args, options={"routing_key": routing_key}) for args in args_list],
+        app=celery,
+    )
+    result = job.apply_async()
+    result.save()
+    return result
+
+
+def bulk_task_status(celery, task_ids):
+    """
+    Resolves many task ids with one MGET on the Redis result backend.
+
+    Returns {"tasks": {task_id: {"status", "result", "date_done"}}, "progress": {...}}.
+    """
+    backend = celery.backend
+    keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+    values = backend.client.mget(keys) if keys else []
+
+    tasks = {}
+    counts = {"succeeded": 0, "failed": 0, "pending": 0, "running": 0}
+    for task_id, raw in zip(task_ids, values):
+        if raw is None:
+            # No meta stored yet: queued (or unknown) task
+            status, result, date_done = states.PENDING, None, None
+        else:
+            meta = backend.decode_result(raw)
+            status, result, date_done = meta["status"], meta["result"], meta.get("date_done")
+
+        if status == states.SUCCESS:
+            counts["succeeded"] += 1
+        elif status in states.EXCEPTION_STATES:
+            counts["failed"] += 1
+            result = str(result)
+        elif status == states.PENDING:
+            counts["pending"] += 1
+        else:
+            counts["running"] += 1
+            result = None
+        if date_done is not None and not isinstance(date_done, str):
+            date_done = date_done.isoformat()
+        tasks[task_id] = {"status": status, "result": result, "date_done": date_done}
+
+    total = len(task_ids)
+    completed = counts["succeeded"] + counts["failed"]
+    progress = dict(counts, total=total, completed=completed,
+                    percent=round(100.0 * completed / total, 1) if total else 100.0)
+    return {"tasks": tasks, "progress": progress}
+
+
+def group_task_ids(celery, group_id):
+    """Task ids of a saved group, or None if the group is unknown."""
+    result = GroupResult.restore(group_id, app=celery)
+    if result is None:
+        return None
+    return [child.id for child in result.results]
+
+
+def requested_task_ids(data):
+    """task_ids list from a bulk status request body, validated."""
+    task_ids = (data or {}).get("task_ids")
+    if not isinstance(task_ids, list) or not all(isinstance(t, str) for t in task_ids):
+        raise ValueError("'task_ids' must be a list of task id strings")
+    if len(task_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} task ids per request")
+    return task_ids
+
+
+def register_status_routes(app, celery, service):
+    """
+    Adds the bulk and group status endpoints of a service to its Flask app:
+
+    - POST /task_status_<service>/bulk: status of many tasks (body: {"task_ids": [...]}) with aggregate progress
+    - GET /task_status_<service>/group/<group_id>: the same for every task of a saved group
+    """
+    def get_bulk_task_status():
+        try:
+            task_ids = requested_task_ids(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            response = bulk_task_status(celery, task_ids)
+            record_completions(service, response["tasks"])  # Only for captured tasks
+            return jsonify(response)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    def get_group_status(group_id):
+        try:
+            task_ids = group_task_ids(celery, group_id)
+            if task_ids is None:
+                return jsonify({"error": "Group not found"}), 404
+
+            response = bulk_task_status(celery, task_ids)
+            record_completions(service, response["tasks"])
+            response["group_id"] = group_id
+            return jsonify(response)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    app.add_url_rule(f"/task_status_{service}/bulk", view_func=get_bulk_task_status, methods=["POST"])
+    app.add_url_rule(f"/task_status_{service}/group/<group_id>", view_func=get_group_status, methods=["GET"])
@@ -1,22 +1,42 @@
+import os
 from celery import Celery
+from kombu import Queue
 
-# Celery app configuration
-app = Celery(
-    'tasks',  # Name for the Celery instance
-    broker='redis://redis:6379/0',  # Redis broker (running in Docker Compose)
-    backend='redis://redis:6379/0',  # Redis result backend
-    broker_connection_retry_on_startup = True
+# Broker and result backend (Redis running in Docker Compose)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
+
+# Define the default queue and custom queues
+task_queues = (
+    Queue('stt', routing_key='stt'),  # All tasks with stt.# go to stt
+    Queue('llm', routing_key='llm'),  # All tasks with llm.# go to llm
+    Queue('tts', routing_key='tts'),  # All tasks with tts.# go to tts
 )
 
-# from celery import Celery
+# Define task routes
+task_routes = {
+    'transcribe_audio': {'queue': 'stt', 'routing_key': 'stt'},
+    'process_llm_query': {'queue': 'llm', 'routing_key': 'llm'},
+    'generate_tts_audio': {'queue': 'tts', 'routing_key': 'tts'},
+}
+
+
+def make_celery(name, include=None):
+    """Celery app with the shared broker, queues and routes."""
+    celery = Celery(
+        name,
+        broker=CELERY_BROKER_URL,
+        backend=CELERY_RESULT_BACKEND,
+        include=include,
+    )
+    celery.conf.update(
+        task_queues=task_queues,
+        task_routes=task_routes,
+        broker_connection_retry_on_startup=True,  # Ensures retries on broker connection
+    )
+    return celery
 
-# # Celery app configuration
-# def make_celery(app):
-#     celery = Celery(
-#         app.name, 
-#         broker=app.config['CELERY_BROKER_URL'],
-#         backend=app.config['CELERY_RESULT_BACKEND']
-#     )
-#     celery.conf.update(app.config)
-#     return celery
 
+# Client app for the HTTP APIs: tasks are sent by name (send_task), so the APIs
+# never import the task modules nor their inference dependencies
+app = make_celery('tasks')
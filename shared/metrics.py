@@ -0,0 +1,19 @@
+import os
+from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+
+
+def metrics_payload():
+    """
+    Prometheus payload for the /metrics endpoints.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the API and the Celery workers of the container
+    write their samples to that directory and the API exposes all of them.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+__all__ = ["metrics_payload", "CONTENT_TYPE_LATEST"]
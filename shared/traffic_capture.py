@@ -0,0 +1,144 @@
+"""
+Sampled capture of the API traffic, to be replayed with locust/traffic_replay.py.
+
+When TRAFFIC_CAPTURE_ENABLED=1, a fraction (TRAFFIC_CAPTURE_SAMPLE_RATE) of the requests
+to /stt, /llm and /tts is recorded in TRAFFIC_CAPTURE_DIR:
+
+- <service>.jsonl: one "request" line per captured request (arrival time, endpoint,
+  content type, payload sha256/size, metadata fields, task id), and one "completion"
+  line when a status endpoint (single, bulk or group) first sees the task finished
+  (worker's date_done)
+- payloads/<sha256>: the raw request body, stored once per distinct payload
+"""
+import datetime
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from celery import states
+from flask import request
+
+# Traffic capture configuration
+capture_config = {
+    "enabled": os.getenv("TRAFFIC_CAPTURE_ENABLED", "0") == "1",
+    "sample_rate": float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", 0.1)),
+    "dir": os.getenv("TRAFFIC_CAPTURE_DIR", "/data/traffic_capture"),
+    "max_payload_bytes": int(os.getenv("TRAFFIC_CAPTURE_MAX_PAYLOAD_BYTES", 25 * 1024 * 1024)),
+}
+
+# Captured tasks whose completion was not recorded yet (bounded, oldest dropped first)
+MAX_PENDING = 10000
+
+_lock = threading.Lock()
+_pending = OrderedDict()
+
+
+def start_capture():
+    """
+    Arrival time and raw body of the current request when it is sampled, else None.
+
+    Must run before request.files / request.json are read.
+    """
+    if not capture_config["enabled"] or random.random() >= capture_config["sample_rate"]:
+        return None
+    return {"ts": time.time(), "body": request.get_data(cache=True)}
+
+
+def _store_payload(body):
+    """Writes the body to the side store (content-addressed). Returns its sha256."""
+    digest = hashlib.sha256(body).hexdigest()
+    payload_dir = os.path.join(capture_config["dir"], "payloads")
+    path = os.path.join(payload_dir, digest)
+    if len(body) <= capture_config["max_payload_bytes"] and not os.path.exists(path):
+        os.makedirs(payload_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=payload_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+    return digest
+
+
+def _append(service, record):
+    os.makedirs(capture_config["dir"], exist_ok=True)
+    line = json.dumps(record) + "\n"
+    with _lock:
+        with open(os.path.join(capture_config["dir"], f"{service}.jsonl"), "a") as f:
+            f.write(line)
+
+
+def record_request(service, capture, task_id, metadata=None):
+    """Logs a sampled request (capture from start_capture) once its task was sent."""
+    if capture is None:
+        return
+    try:
+        body = capture["body"]
+        _append(service, {
+            "type": "request",
+            "service": service,
+            "ts": capture["ts"],
+            "method": request.method,
+            "endpoint": request.path,
+            "content_type": request.content_type,
+            "payload_sha256": _store_payload(body),
+            "payload_size": len(body),
+            "payload_stored": len(body) <= capture_config["max_payload_bytes"],
+            "metadata": metadata or {},
+            "task_id": task_id,
+        })
+        with _lock:
+            _pending[task_id] = capture["ts"]
+            while len(_pending) > MAX_PENDING:
+                _pending.popitem(last=False)
+    except Exception as e:
+        print(f"❌ Traffic capture failed: {e}")
+
+
+def to_timestamp(date_done):
+    """Epoch seconds of a Celery date_done (datetime or ISO string, naive means UTC)."""
+    if date_done is None:
+        return None
+    if isinstance(date_done, str):
+        date_done = datetime.datetime.fromisoformat(date_done)
+    if date_done.tzinfo is None:
+        date_done = date_done.replace(tzinfo=datetime.timezone.utc)
+    return date_done.timestamp()
+
+
+def _record_done(service, task_id, status, date_done):
+    with _lock:
+        arrival = _pending.pop(task_id, None)
+    if arrival is None:
+        return
+    try:
+        completed = to_timestamp(date_done) or time.time()
+        _append(service, {
+            "type": "completion",
+            "service": service,
+            "task_id": task_id,
+            "ts": completed,
+            "status": status,
+            "latency_seconds": completed - arrival,
+        })
+    except Exception as e:
+        print(f"❌ Traffic capture failed: {e}")
+
+
+def record_completion(service, task):
+    """Logs the completion of a captured task (AsyncResult) the first time it is seen ready."""
+    if not capture_config["enabled"] or task.id not in _pending or not task.ready():
+        return
+    _record_done(service, task.id, task.state, task.date_done)
+
+
+def record_completions(service, tasks):
+    """Same for the {task_id: {"status", "date_done"}} of a bulk status response."""
+    if not capture_config["enabled"]:
+        return
+    for task_id, task in tasks.items():
+        if task_id in _pending and task["status"] in states.READY_STATES:
+            _record_done(service, task_id, task["status"], task["date_done"])